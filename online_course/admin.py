@@ -1,5 +1,15 @@
-from django.contrib import admin
-from .models import Instructor, Learner, Course, Lesson, Question, Choice, Submission, SubmissionAnswer
+from django.contrib import admin, messages
+from django.shortcuts import redirect, render
+from django.urls import path
+from .models import (
+    Instructor, Learner, Course, Lesson, Question, Choice, Submission, SubmissionAnswer,
+    LessonStats, CourseStats, CourseProgress, QuestionStats,
+)
+from .changelists import AutocompleteFilter, KeysetPaginationMixin
+from .grading import invalidate_answer_key
+from .forms import QuestionBankImportForm
+from .item_analysis import start_refresh
+from .question_bank import QuestionBankError, import_question_bank, parse_question_bank
 
 
 class QuestionInline(admin.TabularInline):
@@ -94,18 +104,57 @@ class QuestionAdmin(admin.ModelAdmin):
     """Admin interface for Question model"""
     list_display = ['question_text', 'lesson', 'question_type', 'points', 'order']
     list_filter = ['question_type', 'lesson', 'created_at']
-    search_fields = ['question_text', 'lesson__title']
+    search_fields = ['question_text', 'lesson__title', 'external_key']
     ordering = ['lesson', 'order']
     inlines = [ChoiceInline]
     fieldsets = (
         ('Question Information', {
-            'fields': ['lesson', 'question_text', 'question_type']
+            'fields': ['lesson', 'question_text', 'question_type', 'external_key']
         }),
         ('Points and Order', {
             'fields': ['points', 'order']
         }),
     )
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Inline choice edits land after the question itself is saved
+        invalidate_answer_key(form.instance.lesson_id)
+
+    def get_urls(self):
+        urls = [
+            path('import/', self.admin_site.admin_view(self.import_view), name='online_course_question_import'),
+        ]
+        return urls + super().get_urls()
+
+    def import_view(self, request):
+        """Upload a question bank and upsert its questions and choices"""
+        if not self.has_add_permission(request) or not self.has_change_permission(request):
+            return redirect('admin:online_course_question_changelist')
+
+        errors = []
+        form = QuestionBankImportForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            upload = form.cleaned_data['file']
+            fmt = form.cleaned_data['format'] or upload.name.rsplit('.', 1)[-1].lower().replace('yml', 'yaml')
+            try:
+                counts = import_question_bank(parse_question_bank(upload.read(), fmt))
+            except QuestionBankError as e:
+                errors = e.errors
+            else:
+                summary = ', '.join(f'{value} {name.replace("_", " ")}' for name, value in counts.items())
+                self.message_user(request, f'Question bank imported: {summary}.', messages.SUCCESS)
+                return redirect('admin:online_course_question_changelist')
+
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Import question bank',
+            'opts': self.model._meta,
+            'form': form,
+            'errors': errors,
+        }
+        return render(request, 'admin/online_course/question/import.html', context)
+
 
 class LessonAdmin(admin.ModelAdmin):
     """Admin interface for Lesson model"""
@@ -116,13 +165,18 @@ class LessonAdmin(admin.ModelAdmin):
     inlines = [QuestionInline]
     fieldsets = (
         ('Lesson Information', {
-            'fields': ['course', 'title', 'order']
+            'fields': ['course', 'title', 'order', 'max_attempts']
         }),
         ('Content', {
             'fields': ['description', 'content']
         }),
     )
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Inline question edits land after the lesson itself is saved
+        invalidate_answer_key(form.instance.pk)
+
 
 class CourseAdmin(admin.ModelAdmin):
     """Admin interface for Course model"""
@@ -146,13 +200,24 @@ class SubmissionAnswerInline(admin.TabularInline):
     readonly_fields = ['question', 'selected_choice', 'is_correct', 'points_earned']
     can_delete = False
 
+    def get_queryset(self, request):
+        # Rows are labelled with str(answer), which reads the submission's student and lesson
+        return super().get_queryset(request).select_related(
+            'submission__student', 'submission__lesson', 'question', 'selected_choice',
+        )
+
 
-class SubmissionAnswerAdmin(admin.ModelAdmin):
+class SubmissionAnswerAdmin(KeysetPaginationMixin, admin.ModelAdmin):
     """Admin interface for SubmissionAnswer model"""
     list_display = ['submission', 'question', 'selected_choice', 'is_correct', 'points_earned']
-    list_filter = ['is_correct', 'submission__status', 'created_at']
+    list_select_related = ['submission__student', 'submission__lesson', 'question', 'selected_choice']
+    list_filter = [
+        'is_correct', 'submission__status', 'created_at',
+        ('submission__student', AutocompleteFilter), ('question__lesson', AutocompleteFilter),
+    ]
     search_fields = ['question__question_text', 'submission__student__username', 'selected_choice__choice_text']
-    ordering = ['-created_at']
+    # Answers are created in id order, so this is newest first like created_at
+    keyset = ('id',)
     readonly_fields = ['submission', 'question', 'selected_choice', 'is_correct', 'points_earned', 'created_at', 'updated_at']
     fieldsets = (
         ('Answer Information', {
@@ -168,17 +233,21 @@ class SubmissionAnswerAdmin(admin.ModelAdmin):
     )
 
 
-class SubmissionAdmin(admin.ModelAdmin):
+class SubmissionAdmin(KeysetPaginationMixin, admin.ModelAdmin):
     """Admin interface for Submission model"""
-    list_display = ['student', 'lesson', 'status', 'score', 'correct_answers', 'submitted_at']
-    list_filter = ['status', 'lesson', 'submitted_at', 'created_at']
+    list_display = ['student', 'lesson', 'attempt', 'status', 'score', 'correct_answers', 'submitted_at']
+    list_select_related = ['student', 'lesson']
+    list_filter = [
+        'status', 'submitted_at', 'created_at',
+        ('student', AutocompleteFilter), ('lesson', AutocompleteFilter),
+    ]
     search_fields = ['student__username', 'lesson__title']
-    ordering = ['-submitted_at']
-    readonly_fields = ['student', 'lesson', 'score', 'correct_answers', 'total_questions', 'submitted_at', 'graded_at', 'created_at', 'updated_at']
+    keyset = ('submitted_at', 'id')
+    readonly_fields = ['student', 'lesson', 'attempt', 'score', 'correct_answers', 'total_questions', 'submitted_at', 'graded_at', 'created_at', 'updated_at']
     inlines = [SubmissionAnswerInline]
     fieldsets = (
         ('Submission Information', {
-            'fields': ['student', 'lesson', 'status']
+            'fields': ['student', 'lesson', 'attempt', 'status']
         }),
         ('Results', {
             'fields': ['score', 'correct_answers', 'total_questions']
@@ -189,6 +258,86 @@ class SubmissionAdmin(admin.ModelAdmin):
         }),
     )
 
+    def get_queryset(self, request):
+        # Raw responses and result snapshots are never displayed here
+        return super().get_queryset(request).defer('responses', 'result_snapshot')
+
+
+class StatsAdmin(admin.ModelAdmin):
+    """Read-only admin for denormalized exam statistics"""
+    list_display = ['__str__', 'attempts', 'average_score', 'pass_rate', 'last_graded_at']
+    readonly_fields = ['attempts', 'passed', 'score_total', 'average_score', 'pass_rate', 'last_graded_at', 'updated_at']
+    ordering = ['-attempts']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+class LessonStatsAdmin(StatsAdmin):
+    """Admin interface for LessonStats model"""
+    list_select_related = ['lesson']
+    search_fields = ['lesson__title', 'lesson__course__name']
+
+
+class CourseStatsAdmin(StatsAdmin):
+    """Admin interface for CourseStats model"""
+    list_select_related = ['course']
+    search_fields = ['course__name']
+
+
+class CourseProgressAdmin(admin.ModelAdmin):
+    """Read-only admin for learners' progress through courses"""
+    list_display = ['user', 'course', 'lessons_passed', 'best_score', 'last_activity_at']
+    list_select_related = ['user', 'course']
+    search_fields = ['user__username', 'course__name']
+    readonly_fields = ['user', 'course', 'lessons_passed', 'best_score', 'last_activity_at', 'updated_at']
+    ordering = ['-last_activity_at']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+class QuestionStatsAdmin(admin.ModelAdmin):
+    """Admin interface for per-question item analysis"""
+    list_display = ['question', 'answered', 'difficulty', 'discrimination', 'updated_at']
+    list_select_related = ['question']
+    search_fields = ['question__question_text', 'question__lesson__title']
+    list_filter = ['question__lesson__course']
+    readonly_fields = ['question', 'answered', 'correct', 'difficulty', 'discrimination', 'choice_counts', 'updated_at']
+    exclude = ['score_sum', 'score_sq_sum', 'correct_score_sum', 'graded_through']
+    ordering = ['question']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        urls = [
+            path(
+                'refresh/',
+                self.admin_site.admin_view(self.refresh_view),
+                name='online_course_questionstats_refresh',
+            ),
+        ]
+        return urls + super().get_urls()
+
+    def refresh_view(self, request):
+        """Start an incremental refresh of item statistics in the background"""
+        if request.method == 'POST':
+            start_refresh()
+            self.message_user(
+                request, 'Item analysis refresh started; reload this page in a moment.', messages.SUCCESS
+            )
+        return redirect('admin:online_course_questionstats_changelist')
+
 
 # Register models
 admin.site.register(Instructor, InstructorAdmin)
@@ -199,3 +348,7 @@ admin.site.register(Question, QuestionAdmin)
 admin.site.register(Choice, ChoiceAdmin)
 admin.site.register(Submission, SubmissionAdmin)
 admin.site.register(SubmissionAnswer, SubmissionAnswerAdmin)
+admin.site.register(LessonStats, LessonStatsAdmin)
+admin.site.register(CourseStats, CourseStatsAdmin)
+admin.site.register(CourseProgress, CourseProgressAdmin)
+admin.site.register(QuestionStats, QuestionStatsAdmin)
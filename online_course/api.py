@@ -0,0 +1,289 @@
+"""
+JSON API for courses, lessons and submission results.
+
+The resource endpoints are read-only. Every response carries a strong ETag
+computed from a single aggregate query over the ``updated_at`` timestamps (and
+row counts, so deletions are noticed) of the rows it is built from. A request
+whose ``If-None-Match`` matches gets a 304 before the full queryset is loaded
+or serialized.
+
+Offline exams are uploaded in bulk to ``SubmissionIngestView`` as JSON Lines.
+"""
+import gzip
+
+from django.conf import settings
+from django.db.models import Count, Max, Prefetch
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.crypto import md5
+from rest_framework import permissions, routers, viewsets
+from rest_framework.exceptions import APIException, ParseError, ValidationError
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .ingest import ingest_submissions
+from .models import Choice, Course, Lesson, Question, Submission, SubmissionAnswer
+from .serializers import (
+    CourseDetailSerializer, CourseSerializer, LessonDetailSerializer, LessonSummarySerializer,
+    SubmissionDetailSerializer, SubmissionSerializer,
+)
+
+# Bump when serializer output changes so clients don't keep stale copies
+ETAG_VERSION = 1
+
+
+class CursorPage(CursorPagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+
+def cursor_pagination(ordering):
+    return type('CursorPage', (CursorPage,), {'ordering': ordering})
+
+
+def make_etag(*parts):
+    return '"%s"' % md5(repr((ETAG_VERSION,) + parts).encode(), usedforsecurity=False).hexdigest()
+
+
+class ConditionalGetMixin:
+    """
+    Answer ``If-None-Match`` revalidations without serializing.
+
+    Subclasses provide ``list_state(queryset)`` and ``object_state(queryset)``
+    returning anything whose repr changes whenever the response would; a
+    ``None`` object state means "not found" and falls through to the 404.
+    """
+    private = False
+    lookup_value_regex = r'\d+'
+
+    def get_base_queryset(self):
+        """The filtered, permission-scoped rows, without serialization extras."""
+        raise NotImplementedError
+
+    def list(self, request, *args, **kwargs):
+        state = self.list_state(self.get_base_queryset())
+        return self.conditional(state, super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        state = self.object_state(self.get_base_queryset().filter(pk=kwargs[self.lookup_field]))
+        return self.conditional(state, super().retrieve, request, *args, **kwargs)
+
+    def conditional(self, state, handler, request, *args, **kwargs):
+        if state is None:
+            return handler(request, *args, **kwargs)
+        user = request.user.pk if self.private else None
+        etag = make_etag(type(self).__name__, request.get_full_path(), user, state)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        response['ETag'] = etag
+        if self.private:
+            patch_cache_control(response, private=True, no_cache=True)
+            patch_vary_headers(response, ('Cookie', 'Authorization'))
+        else:
+            patch_cache_control(response, no_cache=True)
+        return response
+
+
+def int_param(request, name):
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValidationError({name: 'A valid integer is required.'})
+
+
+class PayloadTooLarge(APIException):
+    status_code = 413
+    default_detail = 'Request body too large.'
+    default_code = 'payload_too_large'
+
+
+def body_lines(request, max_size):
+    """
+    Yield the lines of the request body as bytes, read from the stream rather
+    than loaded whole, and gunzipped when sent with ``Content-Encoding: gzip``.
+
+    Raises PayloadTooLarge once more than ``max_size`` bytes (decompressed)
+    have been read; lines already yielded have been consumed by then.
+    """
+    try:
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        length = 0
+    if length > max_size:
+        raise PayloadTooLarge(f'Request body exceeds {max_size} bytes.')
+    stream = request.stream
+    if stream is None:
+        return
+    if request.headers.get('Content-Encoding') == 'gzip':
+        stream = gzip.GzipFile(fileobj=stream, mode='rb')
+    read = 0
+    while True:
+        try:
+            # A line longer than what is left of the cap is cut short, not buffered
+            line = stream.readline(max_size - read + 1)
+        except (OSError, EOFError):
+            raise ParseError('Body is not valid gzip.')
+        if not line:
+            return
+        read += len(line)
+        if read > max_size:
+            raise PayloadTooLarge(f'Request body exceeds {max_size} bytes.')
+        yield line
+
+
+class CourseViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
+    """Courses with their lesson counts; the detail view lists the lessons."""
+    permission_classes = [permissions.AllowAny]
+    pagination_class = cursor_pagination('-created_at')
+
+    def get_base_queryset(self):
+        return Course.objects.all()
+
+    def get_queryset(self):
+        queryset = self.get_base_queryset().only(
+            'id', 'name', 'description', 'created_at', 'updated_at'
+        ).with_lesson_counts()
+        if self.action == 'retrieve':
+            lessons = Lesson.objects.only(
+                'id', 'course_id', 'title', 'description', 'order', 'updated_at'
+            ).annotate(question_count=Count('questions'))
+            queryset = queryset.prefetch_related(Prefetch('lessons', queryset=lessons))
+        return queryset
+
+    def get_serializer_class(self):
+        return CourseDetailSerializer if self.action == 'retrieve' else CourseSerializer
+
+    def list_state(self, queryset):
+        return queryset.aggregate(
+            changed=Max('updated_at'), courses=Count('id', distinct=True), lessons=Count('lessons'),
+        )
+
+    def object_state(self, queryset):
+        state = queryset.aggregate(
+            changed=Max('updated_at'),
+            lessons_changed=Max('lessons__updated_at'),
+            lessons=Count('lessons', distinct=True),
+            questions=Count('lessons__questions'),
+        )
+        return state if state['changed'] else None
+
+
+class LessonViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Lessons, optionally filtered with ``?course=<id>``. The detail view adds
+    the content and the questions with their choices, but never which
+    choices are correct.
+    """
+    permission_classes = [permissions.AllowAny]
+    pagination_class = cursor_pagination(('order', 'id'))
+
+    def get_base_queryset(self):
+        queryset = Lesson.objects.all()
+        course_id = int_param(self.request, 'course')
+        if course_id is not None:
+            queryset = queryset.filter(course_id=course_id)
+        return queryset
+
+    def get_queryset(self):
+        fields = ['id', 'course_id', 'title', 'description', 'order', 'updated_at']
+        if self.action == 'retrieve':
+            fields.append('content')
+        queryset = self.get_base_queryset().only(*fields).annotate(question_count=Count('questions'))
+        if self.action == 'retrieve':
+            choices = Choice.objects.only('id', 'question_id', 'choice_text', 'order').order_by(
+                'question_id', 'order', 'id'
+            )
+            questions = Question.objects.only(
+                'id', 'lesson_id', 'question_text', 'question_type', 'points', 'order'
+            ).prefetch_related(Prefetch('choices', queryset=choices))
+            queryset = queryset.prefetch_related(Prefetch('questions', queryset=questions))
+        return queryset
+
+    def get_serializer_class(self):
+        return LessonDetailSerializer if self.action == 'retrieve' else LessonSummarySerializer
+
+    def list_state(self, queryset):
+        return queryset.aggregate(
+            changed=Max('updated_at'), lessons=Count('id', distinct=True), questions=Count('questions'),
+        )
+
+    def object_state(self, queryset):
+        state = queryset.aggregate(
+            changed=Max('updated_at'),
+            questions_changed=Max('questions__updated_at'),
+            choices_changed=Max('questions__choices__updated_at'),
+            questions=Count('questions', distinct=True),
+            choices=Count('questions__choices'),
+        )
+        return state if state['changed'] else None
+
+
+class SubmissionViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    The current user's submissions (all submissions for staff), optionally
+    filtered with ``?lesson=<id>``. The detail view adds the graded answers.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = cursor_pagination('-id')
+    private = True
+
+    def get_base_queryset(self):
+        queryset = Submission.objects.all()
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(student=self.request.user)
+        lesson_id = int_param(self.request, 'lesson')
+        if lesson_id is not None:
+            queryset = queryset.filter(lesson_id=lesson_id)
+        return queryset
+
+    def get_queryset(self):
+        queryset = self.get_base_queryset().select_related('lesson').only(
+            'id', 'lesson__id', 'lesson__course_id', 'attempt', 'status', 'score', 'total_questions',
+            'correct_answers', 'submitted_at', 'graded_at', 'updated_at',
+        )
+        if self.action == 'retrieve':
+            answers = SubmissionAnswer.objects.only(
+                'id', 'submission_id', 'question_id', 'selected_choice_id', 'is_correct', 'points_earned'
+            ).order_by('question__order', 'question_id')
+            queryset = queryset.prefetch_related(Prefetch('answers', queryset=answers))
+        return queryset
+
+    def get_serializer_class(self):
+        return SubmissionDetailSerializer if self.action == 'retrieve' else SubmissionSerializer
+
+    def list_state(self, queryset):
+        return queryset.aggregate(changed=Max('updated_at'), submissions=Count('id'))
+
+    def object_state(self, queryset):
+        # Answers are only written while grading, which also saves the submission
+        return queryset.values_list('updated_at', flat=True).first()
+
+
+class SubmissionIngestView(APIView):
+    """
+    Grade and store a batch of exams taken offline (staff only).
+
+    The body is JSON Lines as described in ``ingest.py``, optionally sent
+    with ``Content-Encoding: gzip``, and is read as a stream of at most
+    ``settings.INGEST_MAX_UPLOAD_SIZE`` bytes. Invalid records are reported
+    by line number in ``errors``; the rest are stored.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request):
+        chunk_size = int_param(request, 'chunk_size') or 1000
+        lines = body_lines(request, getattr(settings, 'INGEST_MAX_UPLOAD_SIZE', 100 * 1024 * 1024))
+        summary = ingest_submissions(lines, chunk_size=max(1, chunk_size))
+        summary['errors'] = [{'line': line_no, 'error': message} for line_no, message in summary['errors']]
+        return Response(summary)
+
+
+router = routers.SimpleRouter()
+router.register('courses', CourseViewSet, basename='api-course')
+router.register('lessons', LessonViewSet, basename='api-lesson')
+router.register('submissions', SubmissionViewSet, basename='api-submission')
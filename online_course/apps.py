@@ -5,3 +5,6 @@ class OnlineCourseConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'online_course'
     verbose_name = 'Online Course'
+
+    def ready(self):
+        from . import checks, query_hooks, signals  # noqa: F401
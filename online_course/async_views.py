@@ -0,0 +1,144 @@
+"""
+Async versions of the exam-taking and course pages, served under ASGI.
+
+course_list, course_details, submit and show_exam_result load their data
+with the async ORM, so the event loop keeps serving other connections while
+a request waits on the database. (The queries themselves still run in a
+thread Django dedicates to the request.) They render the same templates from
+the same contexts as the views in views.py. urls.py routes to them when
+``ASYNC_VIEWS`` is set, which asgi.py does by default.
+
+Django 4.2's login_required and require_http_methods only wrap sync views,
+hence the checks here. The user is loaded off the event loop once, before
+anything touches ``request.user``. Exam POSTs grade inside a transaction,
+which the async ORM cannot open, so they are handed to the sync view.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.http import Http404, HttpResponseNotAllowed
+from django.shortcuts import redirect, render
+
+from . import views
+from .attempts import abest_attempt, alatest_attempt, attempts_used
+from .autosave import saved_answers
+from .fragments import render_course_details
+from .models import Course, Lesson, Question, Submission
+from .results import get_snapshot
+
+
+async def _load_user(request):
+    # The lazy request.user queries the session and user tables when first
+    # evaluated, which is not allowed on the event loop; templates use it too
+    await sync_to_async(lambda: request.user.is_authenticated)()
+    return request.user
+
+
+def login_required(view):
+    """login_required for async views."""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user = await _load_user(request)
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path(), 'login')
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+def require_http_methods(methods):
+    """require_http_methods for async views."""
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return HttpResponseNotAllowed(methods)
+            return await view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@login_required
+@require_http_methods(["GET", "POST"])
+async def submit(request, lesson_id):
+    """
+    Handle exam submission for a lesson.
+    GET: Display exam questions
+    POST: Process and submit exam answers, via views.submit
+    """
+    if request.method == 'POST':
+        return await sync_to_async(views.submit)(request, lesson_id)
+
+    try:
+        lesson = await Lesson.objects.select_related('course').aget(id=lesson_id)
+    except Lesson.DoesNotExist:
+        raise Http404('Lesson not found')
+
+    latest = await alatest_attempt(request.user.id, lesson.id)
+    questions = [
+        question async for question in Question.objects.filter(lesson=lesson).prefetch_related('choices')
+    ]
+    best = await abest_attempt(request.user.id, lesson.id) if attempts_used(latest) else None
+    # Restore autosaved answers of the attempt in progress
+    draft = latest if latest is not None and latest.status == 'IN_PROGRESS' else None
+    saved = await sync_to_async(saved_answers)(request.user.id, lesson.id, draft)
+
+    context = views.exam_context(lesson, questions, latest, best, saved)
+    return render(request, 'online_course/exam_submission.html', context)
+
+
+@login_required
+async def show_exam_result(request, submission_id):
+    """
+    Display the results of a submitted exam.
+    Shows score, correct/incorrect answers, and detailed feedback.
+    """
+    try:
+        submission = await Submission.objects.select_related('student', 'lesson__course').aget(id=submission_id)
+    except Submission.DoesNotExist:
+        raise Http404('Submission not found')
+
+    # Ensure the user can only view their own results
+    if submission.student_id != request.user.id and not request.user.is_staff:
+        return redirect('online_course:course_list')
+
+    # Grading is still queued for a worker; let the page poll for it
+    if submission.status != 'GRADED':
+        return render(request, 'online_course/exam_pending.html', views.pending_context(submission))
+
+    # Only submissions graded before snapshots existed need the database here
+    snapshot = submission.result_snapshot
+    if snapshot is None:
+        snapshot = await sync_to_async(get_snapshot)(submission)
+    return render(request, 'online_course/exam_result.html', views.result_context(submission, snapshot))
+
+
+async def course_details(request, course_id):
+    """
+    Display detailed information about a course including all lessons and their questions.
+    """
+    try:
+        course = await Course.objects.aget(id=course_id)
+    except Course.DoesNotExist:
+        raise Http404('Course not found')
+    await _load_user(request)
+
+    # The page body is served from the fragment cache between edits
+    context = {
+        'course': course,
+        'course_body': await sync_to_async(render_course_details)(course),
+    }
+
+    return render(request, 'online_course/course_details_bootstrap.html', context)
+
+
+async def course_list(request):
+    """Display list of all available courses"""
+    courses = [course async for course in Course.objects.with_lesson_counts()]
+    await _load_user(request)
+
+    context = {
+        'courses': courses,
+    }
+
+    return render(request, 'online_course/course_list.html', context)
@@ -0,0 +1,70 @@
+"""
+Multiple exam attempts per lesson.
+
+Every attempt is its own Submission, numbered from 1 per (student, lesson).
+Retaking an exam inserts the next attempt with its own answers; earlier
+attempts and their answers are never rewritten. A lesson allows
+``Lesson.max_attempts`` attempts, or ``EXAM_MAX_ATTEMPTS`` when it sets no
+limit of its own; None there means unlimited.
+
+The unique (student, lesson, attempt) index serves both lookups: the latest
+attempt is the last entry of that index range, and the best one is picked
+from the handful of rows in it.
+"""
+from django.conf import settings
+
+from .models import Submission
+
+# Columns never needed to decide between attempts
+HEAVY_FIELDS = ('responses', 'result_snapshot')
+
+
+def max_attempts(lesson):
+    """The number of attempts ``lesson`` allows, or None for unlimited."""
+    if lesson.max_attempts is not None:
+        return lesson.max_attempts
+    return getattr(settings, 'EXAM_MAX_ATTEMPTS', None)
+
+
+def attempts_left(lesson, attempts_used):
+    """How many more attempts a learner who used ``attempts_used`` has, or None for unlimited."""
+    limit = max_attempts(lesson)
+    return None if limit is None else max(limit - attempts_used, 0)
+
+
+def attempts_used(latest):
+    """
+    The attempts used by a learner whose latest attempt is ``latest`` (or
+    None). A draft is the attempt about to be submitted, not a used one.
+    """
+    if latest is None:
+        return 0
+    return latest.attempt - 1 if latest.status == 'IN_PROGRESS' else latest.attempt
+
+
+def latest_attempt(student_id, lesson_id):
+    """The learner's most recent attempt at a lesson, whatever its status, or None."""
+    return Submission.objects.filter(student_id=student_id, lesson_id=lesson_id).defer(
+        *HEAVY_FIELDS
+    ).order_by('-attempt').first()
+
+
+def best_attempt(student_id, lesson_id):
+    """The learner's highest-scoring graded attempt at a lesson (the earliest on ties), or None."""
+    return Submission.objects.filter(student_id=student_id, lesson_id=lesson_id, status='GRADED').defer(
+        *HEAVY_FIELDS
+    ).order_by('-score', 'attempt').first()
+
+
+async def alatest_attempt(student_id, lesson_id):
+    """Async version of latest_attempt()."""
+    return await Submission.objects.filter(student_id=student_id, lesson_id=lesson_id).defer(
+        *HEAVY_FIELDS
+    ).order_by('-attempt').afirst()
+
+
+async def abest_attempt(student_id, lesson_id):
+    """Async version of best_attempt()."""
+    return await Submission.objects.filter(student_id=student_id, lesson_id=lesson_id, status='GRADED').defer(
+        *HEAVY_FIELDS
+    ).order_by('-score', 'attempt').afirst()
@@ -0,0 +1,145 @@
+"""
+Autosave of in-progress exam answers.
+
+exam_submission.html posts every change as a delta of answers,
+``{question_id: choice_id}``, to the ``autosave`` view. Deltas are merged
+into a per-(student, lesson) buffer in the cache. The buffer is flushed to the
+learner's IN_PROGRESS draft attempt, with one upsert of its SubmissionAnswer
+rows, at most once per ``AUTOSAVE_FLUSH_INTERVAL`` seconds. Autosaves in
+between only touch the cache, so a learner saving every few seconds costs one
+write per interval however many answers they changed.
+
+The flush window is opened with ``cache.add()``, which only one request can
+win. Whatever is still buffered when the window closes is flushed by the next
+autosave, or by the one the page sends when it is hidden. Submitting the exam
+discards the buffer: the final POST carries every answer. Reloading the exam
+page restores the draft's answers overlaid with the buffer.
+
+A learner's autosaves are sent one at a time, so the buffer is read and
+written back without a lock. Across processes, ``AUTOSAVE_CACHE_ALIAS`` must
+name a shared cache such as Redis or Memcached.
+
+Draft answers are stored unscored; grading the draft replaces them.
+"""
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .attempts import attempts_left, latest_attempt
+from .caching import get_cache
+from .models import Lesson, Submission, SubmissionAnswer
+
+
+def buffer_key(student_id, lesson_id):
+    return f'autosave:{student_id}:{lesson_id}'
+
+
+def clean_answers(delta, answer_key):
+    """The ``{question_id: choice_id}`` pairs of ``delta`` whose choice belongs to its question."""
+    answers = {}
+    for question_id, choice_id in delta.items():
+        try:
+            question_id, choice_id = int(question_id), int(choice_id)
+        except (TypeError, ValueError):
+            continue
+        _, choices = answer_key.get(question_id, (0, {}))
+        if choice_id in choices:
+            answers[question_id] = choice_id
+    return answers
+
+
+def _open_draft(student_id, lesson_id):
+    """The pk of the learner's draft attempt, started if needed, or None if they cannot start one."""
+    latest = latest_attempt(student_id, lesson_id)
+    if latest is not None and latest.status == 'IN_PROGRESS':
+        return latest.pk
+    if latest is not None and latest.status == 'SUBMITTED':
+        return None
+    lesson = Lesson.objects.only('max_attempts').get(pk=lesson_id)
+    used = latest.attempt if latest is not None else 0
+    if attempts_left(lesson, used) == 0:
+        return None
+    try:
+        with transaction.atomic():
+            return Submission.objects.create(
+                student_id=student_id, lesson_id=lesson_id, attempt=used + 1, status='IN_PROGRESS'
+            ).pk
+    except IntegrityError:
+        # Started by a concurrent submit
+        latest = latest_attempt(student_id, lesson_id)
+        return latest.pk if latest.status == 'IN_PROGRESS' else None
+
+
+def _flush(student_id, lesson_id, buffer):
+    """Upsert the buffered answers into the draft attempt. Returns False once the draft was submitted."""
+    now = timezone.now()
+    with transaction.atomic():
+        if buffer['draft'] is None:
+            buffer['draft'] = _open_draft(student_id, lesson_id)
+            if buffer['draft'] is None:
+                return False
+        # Locks the draft against a concurrent submit, and checks it still is one
+        elif not Submission.objects.filter(pk=buffer['draft'], status='IN_PROGRESS').update(updated_at=now):
+            return False
+        SubmissionAnswer.objects.bulk_create(
+            [
+                SubmissionAnswer(
+                    submission_id=buffer['draft'],
+                    question_id=question_id,
+                    selected_choice_id=choice_id,
+                    created_at=now,
+                    updated_at=now,
+                )
+                for question_id, choice_id in buffer['pending'].items()
+            ],
+            update_conflicts=True,
+            unique_fields=['submission', 'question'],
+            update_fields=['selected_choice', 'updated_at'],
+        )
+    buffer['pending'] = {}
+    return True
+
+
+def save_answers(student_id, lesson_id, answers, flush=False):
+    """
+    Buffer a delta of answers and flush the buffer if its window is open, or
+    right away with ``flush=True``.
+
+    Returns ``{'buffered': n, 'flushed': bool}``, or None when the learner has
+    no draft to save to: their attempt is awaiting grading, or none are left.
+    """
+    cache = get_cache('AUTOSAVE_CACHE_ALIAS')
+    key = buffer_key(student_id, lesson_id)
+    buffer = cache.get(key) or {'draft': None, 'pending': {}}
+    buffer['pending'].update(answers)
+
+    flushed = False
+    interval = getattr(settings, 'AUTOSAVE_FLUSH_INTERVAL', 30)
+    if buffer['pending'] and (flush or cache.add(f'{key}:window', True, timeout=interval)):
+        if not _flush(student_id, lesson_id, buffer):
+            cache.delete(key)
+            return None
+        flushed = True
+    cache.set(key, buffer, timeout=getattr(settings, 'AUTOSAVE_BUFFER_TIMEOUT', 60 * 60 * 24))
+    return {'buffered': len(buffer['pending']), 'flushed': flushed}
+
+
+def saved_answers(student_id, lesson_id, draft):
+    """
+    ``{question_id: choice_id}`` of the learner's autosaved answers: those of
+    ``draft``, their IN_PROGRESS attempt if any, overlaid with the buffer.
+    """
+    answers = {}
+    if draft is not None:
+        answers.update(
+            SubmissionAnswer.objects.filter(submission=draft).values_list('question_id', 'selected_choice_id')
+        )
+    buffer = get_cache('AUTOSAVE_CACHE_ALIAS').get(buffer_key(student_id, lesson_id))
+    if buffer is not None and buffer['draft'] in (None, getattr(draft, 'pk', None)):
+        answers.update(buffer['pending'])
+    return answers
+
+
+def discard_buffer(student_id, lesson_id):
+    """Drop the buffer of an exam that was just submitted."""
+    get_cache('AUTOSAVE_CACHE_ALIAS').delete(buffer_key(student_id, lesson_id))
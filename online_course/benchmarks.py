@@ -0,0 +1,522 @@
+"""
+Benchmarks for the exam hot paths.
+
+Each scenario drives one view through the Django test client against a
+synthetic dataset built with ``create_sample_data`` and records per-request
+latency, the number of SQL queries and peak Python memory. Results are plain
+dicts so they can be dumped to JSON and compared against a saved baseline.
+
+run_concurrent_submissions() is a load test instead: many threads POST
+exams at once to measure write throughput and lock errors.
+
+run_server_capacity() serves pages to many concurrent connections through
+the process's WSGI or ASGI application, to compare the two deployments.
+"""
+import asyncio
+import io
+import math
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test import Client
+from django.urls import reverse
+
+from .grading import load_answer_key
+from .models import Course, Submission
+from .query_inspector import QueryCapture, explain_queries
+
+SCENARIOS = (
+    'course_list', 'course_details', 'submit_get', 'submit_post', 'show_exam_result',
+    'admin_submissions', 'admin_answers',
+)
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+@contextmanager
+def count_queries():
+    """Count the queries executed on the default connection."""
+    counter = {'queries': 0}
+
+    def wrapper(execute, sql, params, many, context):
+        counter['queries'] += 1
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(wrapper):
+        yield counter
+
+
+def build_dataset(size, questions_per_lesson=20, seed=0):
+    """
+    Generate a course with ``size`` lessons and graded submissions.
+
+    Returns the objects the scenarios need: the course, its first lesson, a
+    learner with a graded submission, a fresh user for exam POSTs and a
+    superuser for the admin.
+    """
+    call_command(
+        'create_sample_data',
+        courses=1,
+        lessons_per_course=size,
+        questions_per_lesson=questions_per_lesson,
+        learners=size,
+        submissions=size,
+        seed=seed,
+        stdout=StringIO(),
+    )
+    return load_dataset(seed)
+
+
+def load_dataset(seed=0):
+    """The objects of build_dataset() for the dataset it created last."""
+    course = Course.objects.order_by('-id').first()
+    lesson = course.lessons.order_by('order').first()
+    submission = Submission.objects.filter(lesson__course=course).select_related('student').first()
+    taker, _ = User.objects.get_or_create(username=f'bench_taker_{seed}')
+    admin, _ = User.objects.get_or_create(
+        username=f'bench_admin_{seed}', defaults={'is_staff': True, 'is_superuser': True},
+    )
+    answers = {
+        f'question_{question.id}': question.choices.order_by('order').first().id
+        for question in lesson.questions.all()
+    }
+    return {
+        'course': course,
+        'lesson': lesson,
+        'submission': submission,
+        'taker': taker,
+        'admin': admin,
+        'answers': answers,
+    }
+
+
+def scenario_requests(name, dataset):
+    """
+    Return ``(client, perform, reset)`` for a scenario.
+
+    ``reset`` runs before every request, outside the timed region, to put the
+    database back into the state the request expects.
+    """
+    client = Client()
+    reset = None
+
+    if name == 'course_list':
+        url = reverse('online_course:course_list')
+        perform = lambda: client.get(url)  # noqa: E731
+    elif name == 'course_details':
+        url = reverse('online_course:course_details', args=[dataset['course'].id])
+        perform = lambda: client.get(url)  # noqa: E731
+    elif name == 'submit_get':
+        client.force_login(dataset['taker'])
+        url = reverse('online_course:submit', args=[dataset['lesson'].id])
+        perform = lambda: client.get(url)  # noqa: E731
+    elif name == 'submit_post':
+        client.force_login(dataset['taker'])
+        url = reverse('online_course:submit', args=[dataset['lesson'].id])
+        perform = lambda: client.post(url, dataset['answers'])  # noqa: E731
+
+        def reset():
+            Submission.objects.filter(student=dataset['taker'], lesson=dataset['lesson']).delete()
+    elif name == 'show_exam_result':
+        client.force_login(dataset['submission'].student)
+        url = reverse('online_course:show_exam_result', args=[dataset['submission'].id])
+        perform = lambda: client.get(url)  # noqa: E731
+    elif name in ('admin_submissions', 'admin_answers'):
+        client.force_login(dataset['admin'])
+        model = 'submission' if name == 'admin_submissions' else 'submissionanswer'
+        url = reverse(f'admin:online_course_{model}_changelist')
+        perform = lambda: client.get(url)  # noqa: E731
+    else:
+        raise ValueError(f'Unknown scenario: {name}')
+
+    return client, perform, reset
+
+
+def measure(perform, reset=None, requests=100, warmup=10, cold=False, memory_samples=10):
+    """Time ``perform`` and return latency percentiles, throughput and queries."""
+    for _ in range(warmup):
+        if reset:
+            reset()
+        perform()
+
+    latencies = []
+    queries = []
+    busy = 0.0
+    for _ in range(requests):
+        if reset:
+            reset()
+        if cold:
+            cache.clear()
+        with count_queries() as counter:
+            start = time.perf_counter()
+            response = perform()
+            elapsed = time.perf_counter() - start
+        if response.status_code >= 400:
+            raise RuntimeError(f'Request failed with status {response.status_code}')
+        busy += elapsed
+        latencies.append(elapsed * 1000)
+        queries.append(counter['queries'])
+
+    # Memory is sampled separately; tracemalloc would distort the timings
+    tracemalloc.start()
+    try:
+        for _ in range(memory_samples):
+            if reset:
+                reset()
+            if cold:
+                cache.clear()
+            tracemalloc.reset_peak()
+            perform()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        'requests': requests,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'mean_ms': round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+        'rps': round(requests / busy, 1) if busy else 0.0,
+        'queries': max(queries) if queries else 0,
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+
+def run_benchmarks(sizes, scenarios=SCENARIOS, requests=100, warmup=10, cold=False,
+                   questions_per_lesson=20, seed=0, log=None):
+    """
+    Run every scenario against a dataset of each size.
+
+    Returns ``{'<scenario>@<size>': metrics}``. Must run against a disposable
+    database; datasets are added to it and never removed.
+    """
+    results = {}
+    for index, size in enumerate(sizes):
+        dataset = build_dataset(size, questions_per_lesson=questions_per_lesson, seed=seed + index)
+        for name in scenarios:
+            _, perform, reset = scenario_requests(name, dataset)
+            cache.clear()
+            metrics = measure(perform, reset=reset, requests=requests, warmup=warmup, cold=cold)
+            results[f'{name}@{size}'] = metrics
+            if log:
+                log(name, size, metrics)
+    return results
+
+
+def audit_indexes(size, scenarios=SCENARIOS, questions_per_lesson=20, seed=0):
+    """
+    Run each scenario once and EXPLAIN the queries it issued.
+
+    Returns ``{scenario: explain_queries() results}``. Must run against a
+    disposable database, like run_benchmarks().
+    """
+    dataset = build_dataset(size, questions_per_lesson=questions_per_lesson, seed=seed)
+    audit = {}
+    for name in scenarios:
+        _, perform, reset = scenario_requests(name, dataset)
+        if reset:
+            reset()
+        cache.clear()
+        capture = QueryCapture()
+        with connection.execute_wrapper(capture):
+            perform()
+        audit[name] = explain_queries(capture.queries)
+    return audit
+
+
+def compare(results, baseline, threshold=0.10):
+    """
+    Compare results against a baseline.
+
+    A scenario regresses when its p95 latency grows by more than ``threshold``
+    (a fraction) or when it runs more queries than before. Returns a list of
+    human-readable regression descriptions.
+    """
+    regressions = []
+    for key, previous in baseline.items():
+        current = results.get(key)
+        if current is None:
+            continue
+        if previous['p95_ms'] and current['p95_ms'] > previous['p95_ms'] * (1 + threshold):
+            change = (current['p95_ms'] / previous['p95_ms'] - 1) * 100
+            regressions.append(
+                f'{key}: p95 {previous["p95_ms"]:.2f}ms -> {current["p95_ms"]:.2f}ms (+{change:.0f}%)'
+            )
+        if current['queries'] > previous['queries']:
+            regressions.append(f'{key}: queries {previous["queries"]} -> {current["queries"]}')
+    return regressions
+
+
+def run_concurrent_submissions(threads=8, requests_per_thread=20, questions_per_lesson=10, seed=0):
+    """
+    POST exams from ``threads`` threads at once, each through its own client
+    and database connection, and report throughput and failures.
+
+    Every thread submits each of ``requests_per_thread`` lessons once as its
+    own user, so the requests never conflict logically; any failures come
+    from database locking. Must run against a disposable file database.
+    """
+    dataset = build_dataset(requests_per_thread, questions_per_lesson=questions_per_lesson, seed=seed)
+    lessons = list(dataset['course'].lessons.order_by('order').values_list('id', flat=True))
+    forms = {}
+    for lesson_id in lessons:
+        answer_key = load_answer_key(lesson_id)
+        forms[lesson_id] = {
+            f'question_{question_id}': min(choices) for question_id, (_, choices) in answer_key.items() if choices
+        }
+
+    clients = []
+    for index in range(threads):
+        user, _ = User.objects.get_or_create(username=f'concurrent_{seed}_{index}')
+        client = Client()
+        client.force_login(user)
+        clients.append(client)
+
+    barrier = threading.Barrier(threads + 1)
+    lock = threading.Lock()
+    latencies = []
+    errors = Counter()
+
+    def work(client):
+        try:
+            barrier.wait()
+            for lesson_id in lessons:
+                url = reverse('online_course:submit', args=[lesson_id])
+                start = time.perf_counter()
+                try:
+                    response = client.post(url, forms[lesson_id])
+                    error = None if response.status_code == 302 else f'HTTP {response.status_code}'
+                except OperationalError as e:
+                    error = str(e)
+                elapsed = (time.perf_counter() - start) * 1000
+                with lock:
+                    if error:
+                        errors[error] += 1
+                    else:
+                        latencies.append(elapsed)
+        finally:
+            connection.close()
+
+    workers = [threading.Thread(target=work, args=(client,)) for client in clients]
+    for worker in workers:
+        worker.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'threads': threads,
+        'requests': threads * len(lessons),
+        'ok': len(latencies),
+        'failed': sum(errors.values()),
+        'errors': dict(errors),
+        'graded': Submission.objects.filter(student__username__startswith=f'concurrent_{seed}_', status='GRADED').count(),
+        'elapsed_s': round(elapsed, 3),
+        'rps': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+    }
+
+
+# Pages of the capacity benchmark, requested in turn by every connection
+CAPACITY_PAGES = ('course_list', 'course_details', 'submit_get', 'show_exam_result')
+
+
+def capacity_pages(dataset):
+    """``[(path, cookie header)]`` of CAPACITY_PAGES, logged in where the page requires it."""
+    def session_cookie(user):
+        client = Client()
+        client.force_login(user)
+        return f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+
+    taker = session_cookie(dataset['taker'])
+    student = session_cookie(dataset['submission'].student)
+    return [
+        (reverse('online_course:course_list'), ''),
+        (reverse('online_course:course_details', args=[dataset['course'].id]), ''),
+        (reverse('online_course:submit', args=[dataset['lesson'].id]), taker),
+        (reverse('online_course:show_exam_result', args=[dataset['submission'].id]), student),
+    ]
+
+
+def wsgi_get(application, path, cookie):
+    """GET ``path`` from a WSGI application the way a WSGI server would; returns the status code."""
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'SCRIPT_NAME': '',
+        'PATH_INFO': path,
+        'QUERY_STRING': '',
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': 'localhost',
+        'HTTP_COOKIE': cookie,
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    statuses = []
+    result = application(environ, lambda status, headers, exc_info=None: statuses.append(status))
+    try:
+        for _ in result:
+            pass
+    finally:
+        # Sends request_finished, which closes expired database connections
+        result.close()
+    return int(statuses[0].split()[0])
+
+
+async def asgi_get(application, path, cookie):
+    """GET ``path`` from an ASGI application the way an ASGI server would; returns the status code."""
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': b'',
+        'root_path': '',
+        'headers': [(b'host', b'localhost'), (b'cookie', cookie.encode())],
+        'client': ('127.0.0.1', 0),
+        'server': ('localhost', 80),
+    }
+    received = False
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        # The client stays connected until the response is sent
+        await asyncio.Event().wait()
+
+    statuses = []
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            statuses.append(message['status'])
+
+    await application(scope, receive, send)
+    return statuses[0]
+
+
+async def _serve_connections(get, pages, connections, requests):
+    """Open ``connections`` concurrent connections, each sending ``requests`` GETs back to back."""
+    latencies = []
+    errors = Counter()
+    peak_threads = threading.active_count()
+
+    async def connection(index):
+        for number in range(requests):
+            path, cookie = pages[(index + number) % len(pages)]
+            start = time.perf_counter()
+            try:
+                status = await get(path, cookie)
+                error = None if status == 200 else f'HTTP {status}'
+            except Exception as e:
+                error = f'{type(e).__name__}: {e}'
+            if error:
+                errors[error] += 1
+            else:
+                latencies.append((time.perf_counter() - start) * 1000)
+
+    async def sample_threads():
+        nonlocal peak_threads
+        while True:
+            peak_threads = max(peak_threads, threading.active_count())
+            await asyncio.sleep(0.005)
+
+    sampler = asyncio.create_task(sample_threads())
+    started = time.perf_counter()
+    await asyncio.gather(*(connection(index) for index in range(connections)))
+    elapsed = time.perf_counter() - started
+    sampler.cancel()
+
+    latencies.sort()
+    return {
+        'connections': connections,
+        'requests': connections * requests,
+        'ok': len(latencies),
+        'failed': sum(errors.values()),
+        'errors': dict(errors),
+        'elapsed_s': round(elapsed, 3),
+        'rps': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'peak_threads': peak_threads,
+    }
+
+
+def run_server_capacity(interface, concurrency=(1, 10, 50, 200), requests=20, threads=8, seed=0):
+    """
+    Serve CAPACITY_PAGES to each number of concurrent connections in
+    ``concurrency`` through this process's ``interface`` ('wsgi' or 'asgi')
+    application, the one its deployment imports.
+
+    WSGI requests are handled by a pool of ``threads`` threads, like a
+    threaded WSGI server; ASGI requests on the event loop. Returns
+    ``{connections: metrics}``. Needs a dataset from build_dataset() and a
+    process whose settings match the interface (ASYNC_VIEWS for ASGI), as
+    URLs are routed once per process.
+    """
+    if interface == 'wsgi':
+        from online_course_project.wsgi import application
+    elif interface == 'asgi':
+        from online_course_project.asgi import application
+    else:
+        raise ValueError(f'Unknown interface: {interface}')
+    pages = capacity_pages(load_dataset(seed))
+
+    async def run():
+        if interface == 'wsgi':
+            loop = asyncio.get_running_loop()
+            pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='wsgi')
+
+            def get(path, cookie):
+                return loop.run_in_executor(pool, wsgi_get, application, path, cookie)
+        else:
+            pool = None
+
+            def get(path, cookie):
+                return asgi_get(application, path, cookie)
+
+        try:
+            # Warm the caches and open the pool's threads
+            await _serve_connections(get, pages, min(threads, len(pages)), len(pages))
+            return {connections: await _serve_connections(get, pages, connections, requests)
+                    for connections in concurrency}
+        finally:
+            if pool:
+                pool.shutdown()
+
+    return asyncio.run(run())
@@ -0,0 +1,65 @@
+"""
+Shared helpers for version-keyed caching.
+
+Cached entries embed a version number in their key. Invalidating a group of
+entries only bumps its version; the stale entries are never read again and
+age out of the cache on their own.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+def get_cache(setting_name):
+    """Return the cache named by ``setting_name``, falling back to 'default'."""
+    return caches[getattr(settings, setting_name, 'default')]
+
+
+def get_version(cache, name):
+    """Return the current version of ``name``, seeding it if missing."""
+    version_key = f'version:{name}'
+    version = cache.get(version_key)
+    if version is None:
+        # Seed with a timestamp rather than 1 so that an evicted version key
+        # can never resurrect an entry cached under an older version.
+        cache.add(version_key, time.time_ns(), timeout=None)
+        version = cache.get(version_key, 0)
+    return version
+
+
+def get_versions(cache, names):
+    """Return ``{name: version}`` for several names with one cache round trip."""
+    keys = {name: f'version:{name}' for name in names}
+    found = cache.get_many(keys.values())
+    versions = {}
+    for name, version_key in keys.items():
+        version = found.get(version_key)
+        versions[name] = version if version is not None else get_version(cache, name)
+    return versions
+
+
+def bump_version(cache, name):
+    """Invalidate everything cached under the current version of ``name``."""
+    try:
+        cache.incr(f'version:{name}')
+    except ValueError:
+        # No version recorded yet, so nothing can have been cached for it.
+        pass
+
+
+def count(cache, name, delta=1):
+    """Increment the counter ``name`` in the cache."""
+    key = f'counter:{name}'
+    if cache.add(key, delta, timeout=None):
+        return
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        cache.add(key, delta, timeout=None)
+
+
+def get_counters(cache, names):
+    """Return ``{name: value}`` for the given counters, defaulting to 0."""
+    values = cache.get_many([f'counter:{name}' for name in names])
+    return {name: values.get(f'counter:{name}', 0) for name in names}
@@ -0,0 +1,221 @@
+"""
+Admin changelists for tables too large to count or page through by offset.
+
+KeysetPaginationMixin replaces Django's paginator on a ModelAdmin. Rows are
+ordered by the fields in ``keyset`` (descending, ending with the primary
+key), and the "Older"/"Newer" links carry an opaque cursor holding the sort
+key of the last or first row shown. Every page is then an index range scan
+of ``list_per_page + 1`` rows, however deep it is, where ``?p=5000`` would
+have had to skip 500,000 rows.
+
+The changelist never runs ``COUNT(*)``. Unfiltered, it shows the table size
+from the database's statistics; filtered, it counts up to
+``count_limit`` matching rows and shows "1000+" beyond that.
+
+AutocompleteFilter replaces the full-list dropdown of a foreign key filter
+with the admin's select2 autocomplete, backed by the related model admin's
+``search_fields``.
+"""
+import base64
+import json
+
+from django import forms
+from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ChangeList
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import F, Max, Q
+
+CURSOR_VAR = 'cursor'
+
+
+def estimated_count(queryset):
+    """
+    The approximate number of rows in the queryset's table, without a scan.
+
+    Uses the planner statistics on PostgreSQL and MySQL. SQLite keeps none,
+    so the highest primary key stands in; rows deleted since are still
+    counted. Returns None when no estimate is available.
+    """
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+        elif connection.vendor == 'mysql':
+            cursor.execute(
+                'SELECT table_rows FROM information_schema.tables '
+                'WHERE table_schema = DATABASE() AND table_name = %s',
+                [table],
+            )
+        else:
+            return queryset.model._base_manager.using(queryset.db).aggregate(n=Max('pk'))['n'] or 0
+        row = cursor.fetchone()
+    # PostgreSQL reports -1 for tables that were never analyzed
+    return row[0] if row and row[0] is not None and row[0] >= 0 else None
+
+
+def _encode_cursor(direction, values):
+    # Full isoformat(): DjangoJSONEncoder would round datetimes to milliseconds
+    payload = json.dumps([direction, values], default=lambda value: value.isoformat(), separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+class KeysetChangeList(ChangeList):
+    """A changelist paged by cursor over ``model_admin.keyset`` instead of by page number."""
+
+    def get_queryset(self, request):
+        # Filter links and "clear all filters" must start from the first page
+        self.cursor = self.params.pop(CURSOR_VAR, None)
+        return super().get_queryset(request)
+
+    def get_ordering(self, request, queryset):
+        # Column sorting is disabled; only the keyset order can be paged by cursor
+        return [F(name).desc(nulls_last=True) for name in self.model_admin.keyset]
+
+    def keyset_fields(self):
+        return [self.opts.get_field(name) for name in self.model_admin.keyset]
+
+    def decode_cursor(self):
+        try:
+            padded = self.cursor + '=' * (-len(self.cursor) % 4)
+            direction, raw_values = json.loads(base64.urlsafe_b64decode(padded))
+            fields = self.keyset_fields()
+            if direction not in ('after', 'before') or len(raw_values) != len(fields):
+                raise ValueError(direction)
+            values = [None if raw is None else field.to_python(raw) for field, raw in zip(fields, raw_values)]
+        except (ValueError, TypeError, ValidationError) as e:
+            raise IncorrectLookupParameters(e)
+        return direction, values
+
+    def keyset_ranges(self, direction, values):
+        """
+        Conditions selecting the rows strictly after (or before) ``values``
+        in descending, nulls-last keyset order, as disjoint ranges in the
+        order they are walked. ``(a, b) < (x, y)`` becomes ``a = x AND b < y``
+        followed by ``a < x``. Run as separate queries, each is an index
+        seek; OR-ed together, databases would scan past the whole tie group
+        of ``a = x`` instead.
+        """
+        fields = self.keyset_fields()
+        ranges = []
+        for index in reversed(range(len(fields))):
+            prefix = Q()
+            for field, value in zip(fields[:index], values[:index]):
+                prefix &= Q(**{f'{field.name}__isnull': True}) if value is None else Q(**{field.name: value})
+            name, value = fields[index].name, values[index]
+            if direction == 'after':
+                steps = [] if value is None else [Q(**{f'{name}__lt': value})]
+                if value is not None and fields[index].null:
+                    steps.append(Q(**{f'{name}__isnull': True}))
+            else:
+                steps = [Q(**{f'{name}__isnull': False}) if value is None else Q(**{f'{name}__gt': value})]
+            ranges.extend(prefix & step for step in steps)
+        return ranges
+
+    def get_results(self, request):
+        queryset = self.queryset
+        per_page = self.list_per_page
+        direction = None
+        if self.cursor:
+            direction, values = self.decode_cursor()
+            if direction == 'before':
+                # Walk backwards from the cursor, then restore display order
+                queryset = queryset.order_by(*(F(name).asc(nulls_first=True) for name in self.model_admin.keyset))
+            rows = []
+            for condition in self.keyset_ranges(direction, values):
+                rows.extend(queryset.filter(condition)[:per_page + 1 - len(rows)])
+                if len(rows) > per_page:
+                    break
+        else:
+            rows = list(queryset[:per_page + 1])
+
+        if direction == 'before':
+            has_newer, has_older = len(rows) > per_page, True
+            rows = rows[:per_page][::-1]
+        else:
+            has_newer, has_older = direction == 'after', len(rows) > per_page
+            rows = rows[:per_page]
+
+        self.result_list = rows
+        self.result_count, self.result_count_estimated, self.result_count_capped = self.count_results()
+        self.full_result_count = None
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.can_show_all = False
+        self.multi_page = has_newer or has_older
+        self.paginator = None
+        self.newer_url = self.page_url('before', rows[0]) if has_newer and rows else None
+        self.older_url = self.page_url('after', rows[-1]) if has_older and rows else None
+        self.first_url = self.get_query_string(remove=[CURSOR_VAR]) if has_newer else None
+
+    def count_results(self):
+        """``(count, estimated, capped)`` for the filtered rows, never a full count."""
+        if not self.queryset.query.where:
+            estimate = estimated_count(self.queryset)
+            if estimate is not None:
+                return estimate, True, False
+        limit = self.model_admin.count_limit
+        count = self.queryset.order_by()[:limit + 1].count()
+        return min(count, limit), False, count > limit
+
+    def page_url(self, direction, row):
+        values = [getattr(row, field.attname) for field in self.keyset_fields()]
+        return self.get_query_string({CURSOR_VAR: _encode_cursor(direction, values)})
+
+
+class KeysetPaginationMixin:
+    """ModelAdmin mixin for changelists paged by KeysetChangeList."""
+    # Sort key, descending, ending with a unique column such as the primary key
+    keyset = ('id',)
+    # Filtered changelists count at most this many rows
+    count_limit = 1000
+    change_list_template = 'admin/online_course/keyset_change_list.html'
+    show_full_result_count = False
+    sortable_by = ()
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+    @property
+    def media(self):
+        # Autocomplete filters render select2 widgets on the changelist
+        return super().media + AutocompleteSelect(None, self.admin_site).media
+
+
+class AutocompleteFilter(admin.FieldListFilter):
+    """
+    Foreign key filter picking its value with the admin's autocomplete.
+
+    Use as ``list_filter = [('lesson', AutocompleteFilter)]``; the related
+    model must be registered with ``search_fields``.
+    """
+    template = 'admin/online_course/autocomplete_filter.html'
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.lookup_kwarg = f'{field_path}__{field.target_field.name}__exact'
+        self.lookup_val = params.get(self.lookup_kwarg)
+        super().__init__(field, request, params, model, model_admin, field_path)
+        self.form_field = forms.ModelChoiceField(
+            queryset=field.remote_field.model._default_manager.all(),
+            widget=AutocompleteSelect(field, model_admin.admin_site, attrs={'data-autocomplete-filter': ''}),
+            required=False,
+        )
+
+    def has_output(self):
+        return True
+
+    def expected_parameters(self):
+        return [self.lookup_kwarg]
+
+    def choices(self, changelist):
+        yield {
+            'selected': self.lookup_val is None,
+            'query_string': changelist.get_query_string(remove=[self.lookup_kwarg]),
+            'display': 'All',
+        }
+
+    def widget(self):
+        return self.form_field.widget.render(self.lookup_kwarg, self.lookup_val)
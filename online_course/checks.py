@@ -0,0 +1,39 @@
+"""
+System checks for deployment settings the app relies on.
+
+Answer keys, course pages and autosave buffers are cached under the aliases
+named by the ``*_CACHE_ALIAS`` settings. Invalidation bumps a version in
+that cache, so every process that grades or renders must share it: with a
+per-process local-memory cache, ``grade_worker`` and the other server
+processes keep serving what they cached until it expires.
+"""
+from django.conf import settings
+from django.core.checks import Warning, register
+
+CACHE_ALIAS_SETTINGS = ('ANSWER_KEY_CACHE_ALIAS', 'FRAGMENT_CACHE_ALIAS', 'AUTOSAVE_CACHE_ALIAS')
+LOCMEM_BACKEND = 'django.core.cache.backends.locmem.LocMemCache'
+
+
+@register()
+def check_shared_caches(app_configs, **kwargs):
+    reasons = []
+    if getattr(settings, 'ASYNC_GRADING', False):
+        reasons.append('ASYNC_GRADING grades in a separate grade_worker process')
+    if getattr(settings, 'WEB_CONCURRENCY', 1) > 1:
+        reasons.append(f'WEB_CONCURRENCY runs {settings.WEB_CONCURRENCY} server processes')
+    if not reasons:
+        return []
+
+    aliases = {}
+    for setting_name in CACHE_ALIAS_SETTINGS:
+        aliases.setdefault(getattr(settings, setting_name, 'default'), []).append(setting_name)
+    warnings = []
+    for alias, setting_names in aliases.items():
+        if settings.CACHES.get(alias, {}).get('BACKEND') == LOCMEM_BACKEND:
+            warnings.append(Warning(
+                f'{", ".join(setting_names)} use the local-memory cache {alias!r}, which is not shared between '
+                f'processes, but {" and ".join(reasons)}.',
+                hint='Set CACHE_BACKEND and CACHE_LOCATION to a shared cache such as Redis or Memcached.',
+                id='online_course.W001',
+            ))
+    return warnings
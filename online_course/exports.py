@@ -0,0 +1,143 @@
+"""
+Streaming exports of submissions and their answers.
+
+Rows are read with keyset pagination on SubmissionAnswer.id, each page via a
+server-side cursor, and encoded page by page as CSV or JSON Lines. Memory use
+stays constant regardless of how many rows are exported, and the output can
+be gzip-compressed on the fly.
+
+Only submitted exams are exported: answers autosaved to an IN_PROGRESS draft
+are left out. The export is one row per answer, so a submission without any
+answers, e.g. a blank exam, has no rows; its score is in the admin and API.
+"""
+import csv
+import datetime
+import io
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import SubmissionAnswer
+
+FORMATS = ('csv', 'jsonl')
+
+# (column name, SubmissionAnswer lookup)
+EXPORT_FIELDS = (
+    ('answer_id', 'id'),
+    ('submission_id', 'submission_id'),
+    ('student', 'submission__student__username'),
+    ('course_id', 'submission__lesson__course_id'),
+    ('course', 'submission__lesson__course__name'),
+    ('lesson_id', 'submission__lesson_id'),
+    ('lesson', 'submission__lesson__title'),
+    ('attempt', 'submission__attempt'),
+    ('status', 'submission__status'),
+    ('score', 'submission__score'),
+    ('submitted_at', 'submission__submitted_at'),
+    ('graded_at', 'submission__graded_at'),
+    ('question_id', 'question_id'),
+    ('question', 'question__question_text'),
+    ('points', 'question__points'),
+    ('choice_id', 'selected_choice_id'),
+    ('choice', 'selected_choice__choice_text'),
+    ('is_correct', 'is_correct'),
+    ('points_earned', 'points_earned'),
+)
+COLUMNS = [column for column, _ in EXPORT_FIELDS]
+
+# Drafts carry unscored autosaved answers, and failed gradings none at all
+EXPORT_STATUSES = ('SUBMITTED', 'GRADED')
+
+
+def parse_boundary(value, end=False):
+    """
+    Parse an ISO date or datetime filter value into an aware datetime.
+
+    A bare date ``until`` boundary (``end=True``) covers the whole day.
+    Raises ValueError for anything else.
+    """
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'Invalid date: {value!r}')
+        if end:
+            day += datetime.timedelta(days=1)
+        moment = datetime.datetime.combine(day, datetime.time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def export_rows(course_id=None, lesson_id=None, since=None, until=None, page_size=5000):
+    """
+    Yield export rows as tuples in COLUMNS order, one keyset page at a time.
+
+    ``since``/``until`` bound ``Submission.submitted_at`` (inclusive and
+    exclusive respectively).
+    """
+    queryset = SubmissionAnswer.objects.filter(submission__status__in=EXPORT_STATUSES).order_by('id')
+    if course_id is not None:
+        queryset = queryset.filter(submission__lesson__course_id=course_id)
+    if lesson_id is not None:
+        queryset = queryset.filter(submission__lesson_id=lesson_id)
+    if since is not None:
+        queryset = queryset.filter(submission__submitted_at__gte=since)
+    if until is not None:
+        queryset = queryset.filter(submission__submitted_at__lt=until)
+    queryset = queryset.values_list(*(lookup for _, lookup in EXPORT_FIELDS))
+
+    last_id = 0
+    while True:
+        page = list(queryset.filter(id__gt=last_id)[:page_size].iterator(chunk_size=page_size))
+        if not page:
+            return
+        yield page
+        last_id = page[-1][0]
+        if len(page) < page_size:
+            return
+
+
+def encode_csv(pages):
+    """Encode pages of rows as CSV text, one chunk per page."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for page in pages:
+        writer.writerows(
+            [value.isoformat() if isinstance(value, datetime.datetime) else value for value in row]
+            for row in page
+        )
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def encode_jsonl(pages):
+    """Encode pages of rows as JSON Lines, one chunk per page."""
+    encoder = DjangoJSONEncoder()
+    for page in pages:
+        yield ''.join(encoder.encode(dict(zip(COLUMNS, row))) + '\n' for row in page)
+
+
+def gzip_chunks(chunks):
+    """Gzip-compress a stream of byte chunks incrementally."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream_export(fmt='csv', compress=False, **filters):
+    """Return an iterator of bytes for an export in the given format."""
+    if fmt not in FORMATS:
+        raise ValueError(f'Unknown format: {fmt!r}')
+    encode = encode_csv if fmt == 'csv' else encode_jsonl
+    chunks = (text.encode('utf-8') for text in encode(export_rows(**filters)))
+    return gzip_chunks(chunks) if compress else chunks
@@ -0,0 +1,12 @@
+from django import forms
+
+from .question_bank import FORMATS
+
+
+class QuestionBankImportForm(forms.Form):
+    """Upload form for importing a question bank from the admin"""
+    file = forms.FileField(help_text='JSON, CSV or YAML question bank')
+    format = forms.ChoiceField(
+        choices=[('', 'Detect from file name')] + [(fmt, fmt.upper()) for fmt in FORMATS],
+        required=False,
+    )
@@ -0,0 +1,173 @@
+"""
+Cached rendering of the course_details page.
+
+The page body is cached at two levels. Each lesson's accordion item is keyed
+on the lesson's ``updated_at``, its position on the page and a content
+version bumped whenever one of its questions or choices changes. The whole
+body is keyed on the course's ``updated_at`` and a course version bumped by
+any lesson, question or choice change (see signals.py). A warm page is served
+with a single query for the course row and none against questions/choices.
+
+With ``COURSE_DETAILS_LAZY_LESSONS`` the page only carries the lessons'
+headers, loaded without their ``content`` and ``description``, and the body of
+the first, expanded lesson. The other bodies are fetched when expanded from
+the lesson_fragment view, which serves each from its own cache entry keyed
+like the lesson's accordion item.
+"""
+from django.conf import settings
+from django.db.models import Count, prefetch_related_objects
+from django.template.loader import render_to_string
+
+from .caching import bump_version, count, get_cache, get_counters, get_version, get_versions
+from .models import Lesson
+
+STAT_NAMES = (
+    'course_details.page.hit',
+    'course_details.page.miss',
+    'course_details.lesson.hit',
+    'course_details.lesson.miss',
+    'course_details.lesson_body.hit',
+    'course_details.lesson_body.miss',
+)
+
+# The lesson columns the accordion headers need in lazy mode
+HEADER_FIELDS = ('id', 'course_id', 'title', 'order', 'updated_at')
+
+
+def _fragment_cache():
+    return get_cache('FRAGMENT_CACHE_ALIAS')
+
+
+def _timeout():
+    return getattr(settings, 'FRAGMENT_CACHE_TIMEOUT', None)
+
+
+def _lazy():
+    return getattr(settings, 'COURSE_DETAILS_LAZY_LESSONS', False)
+
+
+def _lesson_keys(cache, lessons, lazy):
+    versions = get_versions(cache, [f'lesson_content:{lesson.id}' for lesson in lessons])
+    return [
+        'course_details:lesson:{}:{}:{}:{}:{}'.format(
+            lesson.id,
+            lesson.updated_at.timestamp(),
+            versions[f'lesson_content:{lesson.id}'],
+            position,
+            'lazy' if lazy else 'full',
+        )
+        for position, lesson in enumerate(lessons, start=1)
+    ]
+
+
+def lesson_body_key(lesson):
+    """The cache key of a lesson's body; ``lesson`` only needs ``id`` and ``updated_at``."""
+    version = get_version(_fragment_cache(), f'lesson_content:{lesson.id}')
+    return f'course_details:lesson_body:{lesson.id}:{lesson.updated_at.timestamp()}:{version}'
+
+
+def render_lesson_body(lesson, key=None):
+    """
+    Return the rendered body of one lesson's accordion item.
+
+    ``lesson`` may have been loaded with only its header fields; the full row,
+    questions and choices are only queried when the cache misses.
+    """
+    cache = _fragment_cache()
+    key = key or lesson_body_key(lesson)
+    body = cache.get(key)
+    if body is not None:
+        count(cache, 'course_details.lesson_body.hit')
+        return body
+
+    count(cache, 'course_details.lesson_body.miss')
+    lesson = Lesson.objects.annotate(question_count=Count('questions')).get(pk=lesson.pk)
+    prefetch_related_objects([lesson], 'questions__choices')
+    body = render_to_string('online_course/course_details_lesson_body.html', {'lesson': lesson})
+    cache.set(key, body, timeout=_timeout())
+    return body
+
+
+def render_lessons(lessons, lazy=False):
+    """
+    Render the accordion item of every lesson, reusing cached fragments.
+
+    Questions and choices are only prefetched for lessons whose fragment
+    missed the cache. Lessons must be annotated with ``question_count``.
+    When ``lazy``, only the first lesson's item includes its body.
+    """
+    cache = _fragment_cache()
+    keys = _lesson_keys(cache, lessons, lazy)
+    fragments = cache.get_many(keys)
+
+    missing = [
+        (position, lesson, key)
+        for position, (lesson, key) in enumerate(zip(lessons, keys), start=1)
+        if key not in fragments
+    ]
+    count(cache, 'course_details.lesson.hit', len(lessons) - len(missing))
+    if missing:
+        count(cache, 'course_details.lesson.miss', len(missing))
+        if not lazy:
+            prefetch_related_objects([lesson for _, lesson, _ in missing], 'questions__choices')
+        rendered = {}
+        for position, lesson, key in missing:
+            if not lazy:
+                body = render_to_string('online_course/course_details_lesson_body.html', {'lesson': lesson})
+            elif position == 1:
+                body = render_lesson_body(lesson)
+            else:
+                body = None
+            rendered[key] = render_to_string('online_course/course_details_lesson.html', {
+                'lesson': lesson,
+                'position': position,
+                'body': body,
+            })
+        cache.set_many(rendered, timeout=_timeout())
+        fragments.update(rendered)
+
+    return [fragments[key] for key in keys]
+
+
+def render_course_details(course):
+    """Return the rendered body of the course_details page for ``course``."""
+    cache = _fragment_cache()
+    lazy = _lazy()
+    page_key = 'course_details:page:{}:{}:{}:{}'.format(
+        course.id,
+        course.updated_at.timestamp(),
+        get_version(cache, f'course_details:{course.id}'),
+        'lazy' if lazy else 'full',
+    )
+    body = cache.get(page_key)
+    if body is not None:
+        count(cache, 'course_details.page.hit')
+        return body
+
+    count(cache, 'course_details.page.miss')
+    lessons = Lesson.objects.filter(course=course).annotate(question_count=Count('questions'))
+    if lazy:
+        lessons = lessons.only(*HEADER_FIELDS)
+    lessons = list(lessons)
+    body = render_to_string('online_course/course_details_body.html', {
+        'course': course,
+        'lessons': lessons,
+        'total_questions': sum(lesson.question_count for lesson in lessons),
+        'lesson_fragments': render_lessons(lessons, lazy),
+    })
+    cache.set(page_key, body, timeout=_timeout())
+    return body
+
+
+def invalidate_course_details(course_id=None, lesson_id=None):
+    """Invalidate the cached page of a course and/or one lesson's fragment."""
+    cache = _fragment_cache()
+    if lesson_id is not None:
+        bump_version(cache, f'lesson_content:{lesson_id}')
+    if course_id is not None:
+        bump_version(cache, f'course_details:{course_id}')
+
+
+def fragment_cache_stats():
+    """Return the hit/miss counters of the course_details caches."""
+    return get_counters(_fragment_cache(), STAT_NAMES)
@@ -0,0 +1,299 @@
+"""
+Set-based grading engine for exam submissions.
+
+Grading a submission runs a fixed number of queries regardless of how many
+questions the lesson has: the answer key is loaded in one round trip, answers
+are validated and scored in memory, and all SubmissionAnswer rows are written
+with a single bulk_create.
+
+Answer keys are cached per lesson in Django's cache framework under a
+versioned key. Saving or deleting a Question or Choice bumps the lesson's
+version (see signals.py), so a warm key is never stale and grading reads
+nothing from the Choice table.
+
+With ``ASYNC_GRADING`` enabled, submissions are stored as SUBMITTED with
+their raw responses and graded later by grade_pending_submissions(), which
+the ``grade_worker`` management command runs in a local worker pool.
+"""
+import logging
+
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .caching import bump_version, get_cache, get_version
+from .models import Question, Submission, SubmissionAnswer
+from .results import build_snapshot, get_exam_sheet
+
+logger = logging.getLogger(__name__)
+
+# Minimum percentage score needed to pass an exam
+PASSING_SCORE = 60
+
+ANSWER_COLUMNS = (
+    'submission', 'question', 'selected_choice', 'is_correct', 'points_earned', 'created_at', 'updated_at',
+)
+
+# Sent inside the grading transaction once a submission is GRADED
+submission_graded = Signal()
+
+# Sent once per batch by bulk ingestion (see ingest.py) instead of
+# submission_graded, with the list of newly GRADED submissions
+submissions_graded = Signal()
+
+
+def load_answer_key(lesson_id):
+    """
+    Load the answer key for a lesson in a single query.
+
+    Returns a dict mapping question id to a ``(points, choices)`` tuple, where
+    ``choices`` maps each choice id of that question to its ``is_correct`` flag.
+    Questions without choices are included with an empty mapping so they still
+    count towards the total.
+    """
+    rows = Question.objects.filter(lesson_id=lesson_id).order_by().values_list(
+        'id', 'points', 'choices__id', 'choices__is_correct'
+    )
+
+    answer_key = {}
+    for question_id, points, choice_id, is_correct in rows:
+        _, choices = answer_key.setdefault(question_id, (points, {}))
+        if choice_id is not None:
+            choices[choice_id] = is_correct
+    return answer_key
+
+
+def get_answer_key(lesson_id):
+    """
+    Return the answer key for a lesson, served from the cache when warm.
+
+    Falls back to load_answer_key() on a miss and stores the result under the
+    lesson's current version.
+    """
+    cache = get_cache('ANSWER_KEY_CACHE_ALIAS')
+    key = f'answer_key:{lesson_id}:{get_version(cache, f"answer_key:{lesson_id}")}'
+    answer_key = cache.get(key)
+    if answer_key is None:
+        answer_key = load_answer_key(lesson_id)
+        timeout = getattr(settings, 'ANSWER_KEY_CACHE_TIMEOUT', 300)
+        cache.set(key, answer_key, timeout=timeout)
+    return answer_key
+
+
+def invalidate_answer_key(lesson_id):
+    """Invalidate the cached answer key of a lesson by bumping its version."""
+    if lesson_id is not None:
+        bump_version(get_cache('ANSWER_KEY_CACHE_ALIAS'), f'answer_key:{lesson_id}')
+
+
+def parse_responses(data, question_ids=None):
+    """
+    Extract ``{question_id: choice_id}`` from submitted form data.
+
+    Expects one ``question_<id>`` field per answered question. When
+    ``question_ids`` is omitted every ``question_<id>`` field is collected.
+    Missing, blank or non-numeric values are ignored.
+    """
+    if question_ids is None:
+        question_ids = []
+        for field in data:
+            prefix, _, question_id = field.partition('_')
+            if prefix == 'question' and question_id.isdigit():
+                question_ids.append(int(question_id))
+
+    responses = {}
+    for question_id in question_ids:
+        value = data.get(f'question_{question_id}')
+        if not value:
+            continue
+        try:
+            responses[question_id] = int(value)
+        except (TypeError, ValueError):
+            continue
+    return responses
+
+
+def score_responses(answer_key, responses):
+    """
+    Score responses against an answer key entirely in memory.
+
+    Choices that do not belong to the question they were submitted for are
+    discarded. Returns a dict with the per-question ``answers`` (question id,
+    choice id, correctness, points earned) and the aggregate totals.
+    """
+    answers = []
+    correct_count = 0
+    earned_points = 0
+    total_points = 0
+
+    for question_id, (points, choices) in answer_key.items():
+        total_points += points
+        choice_id = responses.get(question_id)
+        if choice_id not in choices:
+            continue
+
+        is_correct = choices[choice_id]
+        points_earned = points if is_correct else 0
+        if is_correct:
+            correct_count += 1
+        earned_points += points_earned
+        answers.append({
+            'question_id': question_id,
+            'choice_id': choice_id,
+            'is_correct': is_correct,
+            'points_earned': points_earned,
+        })
+
+    if total_points > 0:
+        score = int((earned_points / total_points) * 100)
+    else:
+        score = 0
+
+    return {
+        'answers': answers,
+        'total_questions': len(answer_key),
+        'correct_answers': correct_count,
+        'earned_points': earned_points,
+        'total_points': total_points,
+        'score': score,
+    }
+
+
+def grade_submission(submission, responses, answer_key=None):
+    """
+    Grade a submission and persist its answers.
+
+    Writes every SubmissionAnswer with one bulk_create and saves the submission
+    as GRADED with its result snapshot. Must be called inside a transaction; any
+    previous answers for the submission are expected to have been cleared by
+    the caller.
+    """
+    if answer_key is None:
+        answer_key = get_answer_key(submission.lesson_id)
+    result = score_responses(answer_key, responses)
+
+    SubmissionAnswer.objects.bulk_create([
+        SubmissionAnswer(
+            submission=submission,
+            question_id=answer['question_id'],
+            selected_choice_id=answer['choice_id'],
+            is_correct=answer['is_correct'],
+            points_earned=answer['points_earned'],
+        )
+        for answer in result['answers']
+    ])
+
+    now = timezone.now()
+    submission.total_questions = result['total_questions']
+    submission.correct_answers = result['correct_answers']
+    submission.score = result['score']
+    submission.result_snapshot = build_snapshot(get_exam_sheet(submission.lesson_id), result['answers'])
+    submission.status = 'GRADED'
+    if submission.submitted_at is None:
+        submission.submitted_at = now
+    submission.graded_at = now
+    submission.save()
+    submission_graded.send(sender=Submission, submission=submission, result=result)
+    return result
+
+
+def insert_answers(graded, now=None):
+    """
+    Write the answers of many graded submissions with one executemany().
+
+    ``graded`` is an iterable of ``(submission_id, result)`` pairs, ``result``
+    as returned by score_responses(). Answers dominate the row count of bulk
+    loads, so they skip model instantiation and SQL compilation entirely.
+    """
+    timestamp = connection.ops.adapt_datetimefield_value(now or timezone.now())
+    rows = [
+        (
+            submission_id,
+            answer['question_id'],
+            answer['choice_id'],
+            answer['is_correct'],
+            answer['points_earned'],
+            timestamp,
+            timestamp,
+        )
+        for submission_id, result in graded
+        for answer in result['answers']
+    ]
+    if not rows:
+        return 0
+    quote = connection.ops.quote_name
+    opts = SubmissionAnswer._meta
+    columns = ', '.join(quote(opts.get_field(name).column) for name in ANSWER_COLUMNS)
+    placeholders = ', '.join(['%s'] * len(ANSWER_COLUMNS))
+    with connection.cursor() as cursor:
+        cursor.executemany(f'INSERT INTO {quote(opts.db_table)} ({columns}) VALUES ({placeholders})', rows)
+    return len(rows)
+
+
+def _grade_queued(pk, submission=None):
+    """
+    Grade one queued submission in its own transaction, or savepoint.
+
+    ``submission`` is passed when the row is already locked by this worker;
+    otherwise it is claimed with a conditional UPDATE first, and skipped if
+    another worker got it. A database error such as "database is locked"
+    leaves the submission SUBMITTED to be retried; anything else marks it
+    FAILED so it is not claimed again at the head of the queue. Returns True
+    if the submission was graded.
+    """
+    try:
+        with transaction.atomic():
+            if submission is None:
+                if not Submission.objects.filter(pk=pk, status='SUBMITTED').update(status='GRADED'):
+                    return False
+                submission = Submission.objects.get(pk=pk)
+            responses = {
+                int(question_id): choice_id
+                for question_id, choice_id in (submission.responses or {}).items()
+            }
+            grade_submission(submission, responses)
+    except OperationalError:
+        logger.warning('Submission %s left queued after a database error', pk, exc_info=True)
+        return False
+    except Exception:
+        logger.exception('Failed to grade submission %s', pk)
+        try:
+            with transaction.atomic():
+                Submission.objects.filter(pk=pk, status='SUBMITTED').update(status='FAILED')
+        except Exception:
+            logger.exception('Could not mark submission %s as failed', pk)
+        return False
+    return True
+
+
+def grade_pending_submissions(batch_size=50):
+    """
+    Claim and grade up to ``batch_size`` SUBMITTED submissions, oldest first.
+
+    Where the database supports it (PostgreSQL), the batch is claimed with
+    ``select_for_update(skip_locked=True)``, so concurrent workers split the
+    queue between them instead of waiting on each other's rows.
+
+    SQLite has no row locks. There the batch is listed outside any
+    transaction and each submission is claimed with a conditional UPDATE
+    that only one worker can win, before its row is read. The grading
+    transaction thus starts with a write and takes the write lock up front,
+    waiting out the busy timeout, instead of upgrading a read lock and
+    failing with "database is locked".
+
+    Submissions whose grading raises are marked FAILED (see _grade_queued);
+    setting one back to SUBMITTED in the admin requeues it. Returns the
+    number of submissions graded.
+    """
+    queue = Submission.objects.filter(status='SUBMITTED').order_by('submitted_at', 'id')
+    graded = 0
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            for submission in queue.select_for_update(skip_locked=True)[:batch_size]:
+                graded += _grade_queued(submission.pk, submission)
+        return graded
+
+    for pk in list(queue.values_list('pk', flat=True)[:batch_size]):
+        graded += _grade_queued(pk)
+    return graded
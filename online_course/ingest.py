@@ -0,0 +1,231 @@
+"""
+Bulk ingestion of exams taken offline, e.g. at proctored test centers.
+
+Input is JSON Lines, one finished exam per line:
+
+    {"student": "alice", "lesson": 12, "answers": {"34": 101, "35": 107},
+     "submitted_at": "2026-03-02T09:41:00Z"}
+
+``student`` is a username or user id and ``answers`` maps question ids to
+the selected choice ids. Exams are graded with the same answer keys and
+scoring as the exam view and written ``chunk_size`` at a time: each chunk
+is validated up front and then stored with a handful of bulk queries in one
+transaction. A bad record is reported with its line number and skipped; it
+never aborts the rest of the batch.
+
+Each exam is stored as the learner's next attempt at the lesson, up to the
+lesson's attempt limit (see attempts.py). An attempt begun online and left
+IN_PROGRESS is completed instead.
+"""
+import json
+
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .attempts import attempts_left
+from .grading import get_answer_key, insert_answers, score_responses, submissions_graded
+from .models import Lesson, Submission, SubmissionAnswer
+from .results import build_snapshot, get_exam_sheet
+
+GRADED_FIELDS = [
+    'status', 'score', 'total_questions', 'correct_answers', 'result_snapshot', 'submitted_at', 'graded_at',
+    'updated_at',
+]
+
+
+class RecordError(ValueError):
+    """A single ingestion record is invalid."""
+
+
+def parse_record(line):
+    """Parse and shape-check one JSONL line (str or bytes). Raises RecordError."""
+    if isinstance(line, bytes):
+        try:
+            line = line.decode('utf-8')
+        except UnicodeDecodeError as e:
+            raise RecordError(f'not valid UTF-8: {e}')
+    try:
+        record = json.loads(line)
+    except ValueError as e:
+        raise RecordError(f'invalid JSON: {e}')
+    if not isinstance(record, dict):
+        raise RecordError('record must be a JSON object')
+
+    student = record.get('student')
+    if isinstance(student, bool) or not isinstance(student, (int, str)) or student == '':
+        raise RecordError('student must be a username or user id')
+
+    lesson = record.get('lesson')
+    if isinstance(lesson, bool) or not isinstance(lesson, int):
+        raise RecordError('lesson must be a lesson id')
+
+    answers = record.get('answers')
+    if not isinstance(answers, dict):
+        raise RecordError('answers must map question ids to choice ids')
+    responses = {}
+    for question_id, choice_id in answers.items():
+        if not str(question_id).isdigit() or isinstance(choice_id, bool) or not isinstance(choice_id, int):
+            raise RecordError(f'invalid answer {question_id!r}: {choice_id!r}')
+        responses[int(question_id)] = choice_id
+
+    submitted_at = record.get('submitted_at')
+    if submitted_at is not None:
+        moment = parse_datetime(submitted_at) if isinstance(submitted_at, str) else None
+        if moment is None:
+            raise RecordError(f'invalid submitted_at: {submitted_at!r}')
+        submitted_at = timezone.make_aware(moment) if timezone.is_naive(moment) else moment
+
+    return {'student': student, 'lesson': lesson, 'responses': responses, 'submitted_at': submitted_at}
+
+
+def _prepare(records):
+    """
+    Resolve, check and grade a chunk of parsed records in memory.
+
+    ``records`` is a list of ``(line_no, record)``. Returns
+    ``(graded, errors)`` where ``graded`` is a list of
+    ``(line_no, submission, result)`` ready to be written.
+    """
+    errors = []
+    names = {r['student'] for _, r in records if isinstance(r['student'], str)}
+    ids = {r['student'] for _, r in records if isinstance(r['student'], int)}
+    users = dict(User.objects.filter(username__in=names).values_list('username', 'id'))
+    users.update((user_id, user_id) for user_id in User.objects.filter(id__in=ids).values_list('id', flat=True))
+    lessons = Lesson.objects.filter(id__in={r['lesson'] for _, r in records}).only(
+        'id', 'course_id', 'max_attempts'
+    ).in_bulk()
+
+    # The latest attempt of every (student, lesson) pair in the chunk
+    latest = {}
+    student_ids = set(users.values())
+    if student_ids and lessons:
+        rows = Submission.objects.filter(student_id__in=student_ids, lesson_id__in=lessons).order_by(
+            'attempt'
+        ).values_list('student_id', 'lesson_id', 'id', 'status', 'attempt')
+        latest = {(student_id, lesson_id): rest for student_id, lesson_id, *rest in rows}
+
+    now = timezone.now()
+    graded = []
+    for line_no, record in records:
+        student_id = users.get(record['student'])
+        if student_id is None:
+            errors.append((line_no, f'unknown student {record["student"]!r}'))
+            continue
+        lesson = lessons.get(record['lesson'])
+        if lesson is None:
+            errors.append((line_no, f'unknown lesson {record["lesson"]}'))
+            continue
+        pair = (student_id, lesson.id)
+        pk, status, attempt = latest.get(pair, (None, None, 0))
+        if status == 'SUBMITTED':
+            message = f'student {record["student"]!r} has an attempt at lesson {lesson.id} awaiting grading'
+            errors.append((line_no, message))
+            continue
+        if status != 'IN_PROGRESS':
+            # Exams begun online and finished offline complete their draft;
+            # anything else is the learner's next attempt
+            if attempts_left(lesson, attempt) == 0:
+                errors.append((line_no, f'student {record["student"]!r} has no attempts left for lesson {lesson.id}'))
+                continue
+            pk, attempt = None, attempt + 1
+        # A later record for the same pair in this chunk is the attempt after
+        latest[pair] = (None, 'GRADED', attempt)
+
+        result = score_responses(get_answer_key(record['lesson']), record['responses'])
+        submission = Submission(
+            pk=pk,
+            student_id=student_id,
+            lesson=lesson,
+            attempt=attempt,
+            status='GRADED',
+            score=result['score'],
+            total_questions=result['total_questions'],
+            correct_answers=result['correct_answers'],
+            result_snapshot=build_snapshot(get_exam_sheet(record['lesson']), result['answers']),
+            submitted_at=record['submitted_at'] or now,
+            graded_at=now,
+            updated_at=now,
+        )
+        graded.append((line_no, submission, result))
+    return graded, errors
+
+
+def _write(graded):
+    """Store graded submissions and their answers in one transaction."""
+    with transaction.atomic():
+        new = [submission for _, submission, _ in graded if submission.pk is None]
+        started = [submission for _, submission, _ in graded if submission.pk is not None]
+        Submission.objects.bulk_create(new)
+        if started:
+            # Exams begun online and finished offline replace their draft answers
+            SubmissionAnswer.objects.filter(submission__in=started).delete()
+            Submission.objects.bulk_update(started, GRADED_FIELDS)
+        insert_answers(((submission.pk, result) for _, submission, result in graded), now=graded[0][1].graded_at)
+        submissions_graded.send(sender=Submission, submissions=[submission for _, submission, _ in graded])
+
+
+def _ingest_chunk(lines):
+    records, errors = [], []
+    for line_no, line in lines:
+        try:
+            records.append((line_no, parse_record(line)))
+        except RecordError as e:
+            errors.append((line_no, str(e)))
+
+    graded, invalid = _prepare(records)
+    errors.extend(invalid)
+    if not graded:
+        return 0, errors
+    drafts = [submission.pk for _, submission, _ in graded]
+    try:
+        _write(graded)
+        return len(graded), errors
+    except IntegrityError:
+        # Something else (usually a concurrent exam POST) created one of the
+        # submissions meanwhile; redo the chunk record by record to find it
+        pass
+
+    written = 0
+    for entry, pk in zip(graded, drafts):
+        entry[1].pk = pk
+        try:
+            _write([entry])
+            written += 1
+        except IntegrityError as e:
+            errors.append((entry[0], f'could not be stored: {e}'))
+    return written, errors
+
+
+def ingest_submissions(lines, chunk_size=1000, on_error=None):
+    """
+    Grade and store exams from an iterable of JSONL lines.
+
+    Returns ``{'ingested': n, 'failed': n, 'errors': [(line_no, message)]}``.
+    ``on_error(line_no, message)`` is called for each rejected record as soon
+    as its chunk has been processed.
+    """
+    summary = {'ingested': 0, 'failed': 0, 'errors': []}
+
+    def flush(chunk):
+        written, errors = _ingest_chunk(chunk)
+        errors.sort()
+        summary['ingested'] += written
+        summary['failed'] += len(errors)
+        summary['errors'].extend(errors)
+        if on_error:
+            for line_no, message in errors:
+                on_error(line_no, message)
+
+    chunk = []
+    for line_no, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        chunk.append((line_no, line))
+        if len(chunk) >= chunk_size:
+            flush(chunk)
+            chunk = []
+    if chunk:
+        flush(chunk)
+    return summary
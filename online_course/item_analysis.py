@@ -0,0 +1,173 @@
+"""
+Item analysis (difficulty and discrimination) for exam questions.
+
+SubmissionAnswer rows are streamed with ``.iterator(chunk_size=...)`` and
+folded into per-question accumulators with NumPy ``bincount``, so memory is
+bounded by the number of questions and choices, not the number of answers.
+
+Refreshes are incremental by question: only questions with answers graded
+since the last run are recomputed, from all of their answers. Progress is
+tracked by ``Submission.graded_at`` rather than by answer id, because ids
+are assigned before commit: a transaction that commits after a refresh may
+hold ids below ones the refresh already read. Each run looks back ``OVERLAP``
+before the previous run started, so gradings that committed late are still
+picked up; recomputing a question twice is harmless.
+
+``manage.py item_analysis`` runs a refresh; the admin starts one in the
+background with start_refresh().
+"""
+import subprocess
+import sys
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import Choice, Question, QuestionStats, SubmissionAnswer
+
+# Longer than any grading transaction is expected to stay open
+OVERLAP = timedelta(minutes=10)
+# Question ids per IN (...) when re-reading the answers of changed questions
+QUESTION_BATCH = 500
+
+ACCUMULATORS = ('answered', 'correct', 'score_sum', 'score_sq_sum', 'correct_score_sum')
+
+
+class _Accumulator:
+    """Dense NumPy accumulators indexed by question and choice position."""
+
+    def __init__(self):
+        self.question_ids = np.array(Question.objects.order_by('id').values_list('id', flat=True), dtype=np.int64)
+        self.choice_ids = np.array(Choice.objects.order_by('id').values_list('id', flat=True), dtype=np.int64)
+        size = len(self.question_ids)
+        self.sums = {name: np.zeros(size, dtype=np.float64) for name in ACCUMULATORS}
+        self.choice_counts = np.zeros(len(self.choice_ids), dtype=np.int64)
+
+    def add(self, rows):
+        """Fold a chunk of (question_id, choice_id, is_correct, score) rows in."""
+        question_ids, choice_ids, correct, score = (np.array(column) for column in zip(*rows))
+        question_ids = question_ids.astype(np.int64)
+        choice_ids = choice_ids.astype(np.int64)
+        correct = correct.astype(np.float64)
+        score = score.astype(np.float64)
+
+        # Answers to questions created after the index was built are skipped
+        q_pos = np.searchsorted(self.question_ids, question_ids)
+        q_pos = np.minimum(q_pos, len(self.question_ids) - 1)
+        known = self.question_ids[q_pos] == question_ids
+        q_pos, correct, score, choice_ids = q_pos[known], correct[known], score[known], choice_ids[known]
+
+        size = len(self.question_ids)
+        self.sums['answered'] += np.bincount(q_pos, minlength=size)
+        self.sums['correct'] += np.bincount(q_pos, weights=correct, minlength=size)
+        self.sums['score_sum'] += np.bincount(q_pos, weights=score, minlength=size)
+        self.sums['score_sq_sum'] += np.bincount(q_pos, weights=score * score, minlength=size)
+        self.sums['correct_score_sum'] += np.bincount(q_pos, weights=score * correct, minlength=size)
+
+        if len(self.choice_ids):
+            c_pos = np.minimum(np.searchsorted(self.choice_ids, choice_ids), len(self.choice_ids) - 1)
+            chosen = self.choice_ids[c_pos] == choice_ids
+            self.choice_counts += np.bincount(c_pos[chosen], minlength=len(self.choice_ids))
+
+
+def refresh_item_analysis(full=False, chunk_size=10000, log=None, overlap=OVERLAP):
+    """
+    Recompute QuestionStats for questions with answers graded since the last run.
+
+    With ``full=True`` every row is reset and all answers are re-read; use it
+    after answers or submissions were deleted. Returns the number of answers
+    read.
+    """
+    started = timezone.now()
+    # Draft answers are unscored until grading replaces them
+    graded = SubmissionAnswer.objects.filter(submission__status='GRADED').order_by()
+    watermark = None if full else QuestionStats.objects.aggregate(last=Max('graded_through'))['last']
+
+    acc = _Accumulator()
+    read = 0
+    if watermark is None:
+        question_ids = None
+        read = _accumulate(acc, graded, chunk_size, log, read)
+    else:
+        changed = graded.filter(submission__graded_at__gte=watermark - overlap)
+        question_ids = list(changed.values_list('question_id', flat=True).distinct())
+        if not question_ids:
+            return 0
+        for offset in range(0, len(question_ids), QUESTION_BATCH):
+            batch = question_ids[offset:offset + QUESTION_BATCH]
+            read = _accumulate(acc, graded.filter(question_id__in=batch), chunk_size, log, read)
+
+    _save(acc, question_ids, started)
+    return read
+
+
+def _accumulate(acc, answers, chunk_size, log, read):
+    """Fold ``answers`` into ``acc`` chunk by chunk; returns the running count of answers read."""
+    rows = answers.values_list('question_id', 'selected_choice_id', 'is_correct', 'submission__score').iterator(
+        chunk_size=chunk_size
+    )
+    chunk = []
+    for question_id, choice_id, is_correct, score in rows:
+        chunk.append((question_id, -1 if choice_id is None else choice_id, is_correct, score))
+        if len(chunk) >= chunk_size:
+            acc.add(chunk)
+            read += len(chunk)
+            chunk = []
+            if log:
+                log(f'answers: {read:,}')
+    if chunk:
+        acc.add(chunk)
+        read += len(chunk)
+    return read
+
+
+def _save(acc, question_ids, graded_through):
+    """
+    Replace the stats of the recomputed questions, or of every question when
+    ``question_ids`` is None.
+    """
+    touched = np.nonzero(acc.sums['answered'])[0]
+    choice_question = dict(Choice.objects.values_list('id', 'question_id'))
+    counts = {}
+    for position in np.nonzero(acc.choice_counts)[0]:
+        choice_id = int(acc.choice_ids[position])
+        counts.setdefault(choice_question[choice_id], {})[str(choice_id)] = int(acc.choice_counts[position])
+
+    rows = []
+    for position in touched:
+        question_id = int(acc.question_ids[position])
+        rows.append(QuestionStats(
+            question_id=question_id,
+            answered=int(acc.sums['answered'][position]),
+            correct=int(acc.sums['correct'][position]),
+            score_sum=float(acc.sums['score_sum'][position]),
+            score_sq_sum=float(acc.sums['score_sq_sum'][position]),
+            correct_score_sum=float(acc.sums['correct_score_sum'][position]),
+            choice_counts=counts.get(question_id, {}),
+            graded_through=graded_through,
+        ))
+
+    with transaction.atomic():
+        if question_ids is None:
+            QuestionStats.objects.all().delete()
+        QuestionStats.objects.bulk_create(
+            rows,
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=['question'],
+            update_fields=list(ACCUMULATORS) + ['choice_counts', 'graded_through', 'updated_at'],
+        )
+
+
+def start_refresh():
+    """Run ``manage.py item_analysis`` in a background process, so no request waits on it."""
+    subprocess.Popen(
+        [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'item_analysis'],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
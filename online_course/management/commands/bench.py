@@ -0,0 +1,89 @@
+import json
+import platform
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+from online_course.benchmarks import SCENARIOS, compare, run_benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the course and exam views against generated datasets'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1,10,100', help='Comma-separated lessons per course')
+        parser.add_argument('--questions-per-lesson', type=int, default=20)
+        parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='Comma-separated scenarios to run')
+        parser.add_argument('--requests', type=int, default=100, help='Timed requests per scenario')
+        parser.add_argument('--warmup', type=int, default=10, help='Untimed requests per scenario')
+        parser.add_argument('--cold', action='store_true', help='Clear the cache before every request')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write results as JSON to this file')
+        parser.add_argument('--baseline', help='Compare against a JSON file written by --output')
+        parser.add_argument('--threshold', type=float, default=0.10,
+                            help='Allowed p95 slowdown against the baseline, as a fraction')
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',') if size]
+        scenarios = [name for name in options['scenarios'].split(',') if name]
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f'Unknown scenarios: {", ".join(sorted(unknown))}')
+
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)['results']
+
+        # Datasets go into a throwaway test database, never the real one
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            results = run_benchmarks(
+                sizes,
+                scenarios=scenarios,
+                requests=options['requests'],
+                warmup=options['warmup'],
+                cold=options['cold'],
+                questions_per_lesson=options['questions_per_lesson'],
+                seed=options['seed'],
+                log=self.log,
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if options['output']:
+            report = {
+                'meta': {
+                    'created_at': timezone.now().isoformat(),
+                    'django': django.get_version(),
+                    'python': platform.python_version(),
+                    'database': connection.vendor,
+                    'options': {
+                        key: options[key]
+                        for key in ('sizes', 'questions_per_lesson', 'requests', 'warmup', 'cold', 'seed')
+                    },
+                },
+                'results': results,
+            }
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+            self.stdout.write(f'Results written to {options["output"]}')
+
+        if baseline is not None:
+            regressions = compare(results, baseline, threshold=options['threshold'])
+            if regressions:
+                for regression in regressions:
+                    self.stdout.write(self.style.ERROR(regression))
+                raise CommandError(f'{len(regressions)} regression(s) against {options["baseline"]}')
+            self.stdout.write(self.style.SUCCESS('No regressions against baseline'))
+
+    def log(self, name, size, metrics):
+        self.stdout.write(
+            f'{name:<18} size={size:<5} p50={metrics["p50_ms"]:>8.2f}ms p95={metrics["p95_ms"]:>8.2f}ms '
+            f'p99={metrics["p99_ms"]:>8.2f}ms rps={metrics["rps"]:>8.1f} queries={metrics["queries"]:>3} '
+            f'peak={metrics["peak_kib"]:>8.1f}KiB'
+        )
@@ -0,0 +1,92 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from online_course.benchmarks import run_server_capacity
+
+INTERFACES = ('wsgi', 'asgi')
+
+# The environment each deployment runs with; asgi.py sets the same defaults
+PROFILES = {
+    'wsgi': {'ASYNC_VIEWS': ''},
+    'asgi': {'ASYNC_VIEWS': '1', 'DATABASE_CONN_MAX_AGE': '0'},
+}
+
+
+class Command(BaseCommand):
+    help = 'Compare how many concurrent connections the WSGI and ASGI deployments serve, on a scratch database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interfaces', default=','.join(INTERFACES), help='Comma-separated: wsgi, asgi')
+        parser.add_argument('--concurrency', default='1,10,50,200', help='Comma-separated connection counts')
+        parser.add_argument('--requests', type=int, default=20, help='Requests per connection')
+        parser.add_argument('--threads', type=int, default=8, help='Worker threads of the WSGI server')
+        parser.add_argument('--size', type=int, default=20, help='Lessons, learners and submissions to generate')
+        parser.add_argument('--output', help='Write results as JSON to this file')
+        # Internal: serve one interface in this process and print its results
+        parser.add_argument('--serve', choices=INTERFACES, help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        try:
+            concurrency = [int(value) for value in options['concurrency'].split(',') if value]
+        except ValueError:
+            raise CommandError('--concurrency takes comma-separated integers')
+        if options['serve']:
+            results = run_server_capacity(
+                options['serve'], concurrency, requests=options['requests'], threads=options['threads'],
+            )
+            self.stdout.write(json.dumps(results))
+            return
+
+        interfaces = [interface for interface in options['interfaces'].split(',') if interface]
+        unknown = set(interfaces) - set(INTERFACES)
+        if unknown:
+            raise CommandError(f'Unknown interfaces: {", ".join(sorted(unknown))}')
+
+        results = {}
+        with tempfile.TemporaryDirectory() as tmp:
+            # Never the real database; every process below shares this one
+            env = {**os.environ, 'DATABASE_URL': f'sqlite:///{os.path.join(tmp, "bench.sqlite3")}'}
+            self.manage(env, 'migrate', '--verbosity', '0')
+            self.manage(
+                env, 'create_sample_data', '--courses', '1', '--lessons-per-course', str(options['size']),
+                '--learners', str(options['size']), '--submissions', str(options['size']), '--seed', '0',
+            )
+            for interface in interfaces:
+                # URLs are routed once per process, so each interface gets its own
+                output = self.manage(
+                    {**env, **PROFILES[interface]}, 'bench_asgi', '--serve', interface,
+                    '--concurrency', options['concurrency'], '--requests', str(options['requests']),
+                    '--threads', str(options['threads']),
+                )
+                results[interface] = json.loads(output.splitlines()[-1])
+                for result in results[interface].values():
+                    self.log(interface, result)
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+            self.stdout.write(f'Results written to {options["output"]}')
+
+    def manage(self, env, *args):
+        completed = subprocess.run(
+            [sys.executable, str(settings.BASE_DIR / 'manage.py'), *args],
+            env=env, capture_output=True, text=True,
+        )
+        if completed.returncode:
+            raise CommandError(f'manage.py {args[0]} failed:\n{completed.stderr}')
+        return completed.stdout
+
+    def log(self, interface, result):
+        self.stdout.write(
+            f'{interface:<5} connections={result["connections"]:<4} ok={result["ok"]}/{result["requests"]} '
+            f'rps={result["rps"]:.1f} p50={result["p50_ms"]:.1f}ms p95={result["p95_ms"]:.1f}ms '
+            f'p99={result["p99_ms"]:.1f}ms threads={result["peak_threads"]}'
+        )
+        for error, count in sorted(result['errors'].items(), key=lambda item: -item[1]):
+            self.stdout.write(self.style.WARNING(f'  {count} x {error}'))
@@ -0,0 +1,86 @@
+import json
+import logging
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from online_course.benchmarks import run_concurrent_submissions
+from online_course_project.databases import database_config
+
+MODES = ('default', 'tuned')
+
+
+class Command(BaseCommand):
+    help = 'Load-test concurrent exam submissions on SQLite, with and without the tuning mode'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes', default=','.join(MODES), help='Comma-separated: default, tuned')
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--requests', type=int, default=20, help='Submissions per thread')
+        parser.add_argument('--questions-per-lesson', type=int, default=10)
+        parser.add_argument('--output', help='Write results as JSON to this file')
+
+    def handle(self, *args, **options):
+        modes = [mode for mode in options['modes'].split(',') if mode]
+        unknown = set(modes) - set(MODES)
+        if unknown:
+            raise CommandError(f'Unknown modes: {", ".join(sorted(unknown))}')
+
+        results = {}
+        for mode in modes:
+            with tempfile.TemporaryDirectory() as tmp:
+                # Each mode gets a fresh database file, never the real one
+                config = database_config(f'sqlite:///{os.path.join(tmp, "bench.sqlite3")}', settings.BASE_DIR, {
+                    'DATABASE_SQLITE_TUNING': '1' if mode == 'tuned' else '',
+                    'DATABASE_CONN_MAX_AGE': '0',
+                })
+                results[mode] = self.run_mode(config, options)
+            self.log(mode, results[mode])
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+            self.stdout.write(f'Results written to {options["output"]}')
+
+    def run_mode(self, config, options):
+        original = connections.settings['default']
+        connections.close_all()
+        connections.settings['default'] = connections.configure_settings({'default': config})['default']
+        self.forget_connection()
+        request_logger = logging.getLogger('django.request')
+        level = request_logger.level
+        # Lock errors are counted in the results; don't print a traceback for each
+        request_logger.setLevel(logging.CRITICAL)
+        try:
+            call_command('migrate', verbosity=0, interactive=False)
+            cache.clear()
+            return run_concurrent_submissions(
+                threads=options['threads'],
+                requests_per_thread=options['requests'],
+                questions_per_lesson=options['questions_per_lesson'],
+            )
+        finally:
+            request_logger.setLevel(level)
+            connections.close_all()
+            connections.settings['default'] = original
+            self.forget_connection()
+
+    def forget_connection(self):
+        # The next query in this thread opens a connection from the new settings
+        try:
+            del connections['default']
+        except AttributeError:
+            pass
+
+    def log(self, mode, result):
+        self.stdout.write(
+            f'{mode:<8} threads={result["threads"]} ok={result["ok"]}/{result["requests"]} '
+            f'failed={result["failed"]} rps={result["rps"]:.1f} p50={result["p50_ms"]:.1f}ms '
+            f'p95={result["p95_ms"]:.1f}ms p99={result["p99_ms"]:.1f}ms'
+        )
+        for error, count in sorted(result['errors'].items(), key=lambda item: -item[1]):
+            self.stdout.write(self.style.WARNING(f'  {count} x {error}'))
@@ -1,13 +1,38 @@
-from django.core.management.base import BaseCommand
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
 from django.contrib.auth.models import User
-from online_course.models import Course, Lesson, Question, Choice
+from django.db import transaction
+from online_course.grading import insert_answers, score_responses
+from online_course.item_analysis import refresh_item_analysis
+from online_course.progress import rebuild_progress
+from online_course.results import build_snapshot
+from online_course.stats import rebuild_course_stats, rebuild_lesson_stats
+from online_course.models import Course, Lesson, Question, Choice, Learner, Submission
 from django.utils import timezone
 
 
 class Command(BaseCommand):
-    help = 'Create sample course data for testing'
+    help = 'Create sample course data for testing, or a large synthetic dataset with --courses'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--courses', type=int, help='Generate a synthetic dataset with this many courses')
+        parser.add_argument('--lessons-per-course', type=int, default=10)
+        parser.add_argument('--questions-per-lesson', type=int, default=10)
+        parser.add_argument('--choices', type=int, default=4, help='Choices per question (one is correct)')
+        parser.add_argument('--learners', type=int, default=100)
+        parser.add_argument('--submissions', type=int, default=0, help='Graded submissions to generate')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed; also namespaces generated usernames')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Rows written per transaction')
 
     def handle(self, *args, **options):
+        if options['courses'] is None:
+            self.create_sample_data()
+        else:
+            self.generate(options)
+
+    def create_sample_data(self):
         self.stdout.write(self.style.SUCCESS('Creating sample data...'))
 
         # Create sample courses
@@ -176,3 +201,188 @@ class Command(BaseCommand):
         self.stdout.write('   Username: admin')
         self.stdout.write('2. View courses at http://localhost:8000/')
         self.stdout.write('3. Take exams to test the application')
+
+    def generate(self, options):
+        """Generate a synthetic dataset with batched bulk_create writes."""
+        courses = options['courses']
+        lessons_per_course = options['lessons_per_course']
+        questions_per_lesson = options['questions_per_lesson']
+        choices_per_question = options['choices']
+        learners = options['learners']
+        submissions = options['submissions']
+        batch_size = max(1, options['batch_size'])
+        rng = random.Random(options['seed'])
+        prefix = f'load{options["seed"]}_'
+
+        if min(courses, lessons_per_course, questions_per_lesson, learners) < 1 or choices_per_question < 2:
+            raise CommandError('Counts must be positive and --choices at least 2.')
+        if submissions > learners * courses * lessons_per_course:
+            raise CommandError('--submissions cannot exceed learners x lessons (one submission per learner and lesson).')
+        if User.objects.filter(username__startswith=prefix).exists():
+            raise CommandError(f'Users prefixed "{prefix}" already exist; pass a different --seed.')
+
+        started = time.monotonic()
+
+        course_objs = self.bulk_write('courses', Course, [
+            Course(name=f'Load Test Course {i + 1}', description=f'Synthetic course {i + 1}')
+            for i in range(courses)
+        ], batch_size)
+
+        lesson_objs = self.bulk_write('lessons', Lesson, [
+            Lesson(
+                course=course,
+                title=f'Lesson {j + 1}',
+                description=f'Synthetic lesson {j + 1} of {course.name}',
+                content='Lorem ipsum dolor sit amet. ' * 20,
+                order=j + 1,
+            )
+            for course in course_objs
+            for j in range(lessons_per_course)
+        ], batch_size)
+
+        question_objs = self.bulk_write('questions', Question, [
+            Question(
+                lesson=lesson,
+                question_text=f'{lesson.title} question {k + 1}?',
+                question_type='MC',
+                points=rng.randint(1, 5),
+                order=k + 1,
+            )
+            for lesson in lesson_objs
+            for k in range(questions_per_lesson)
+        ], batch_size)
+
+        # Answer keys and exam sheets are built in memory so submissions never read them back
+        answer_keys = {lesson.id: {} for lesson in lesson_objs}
+        sheets = {lesson.id: {} for lesson in lesson_objs}
+        choice_objs = []
+        for question in question_objs:
+            correct = rng.randrange(choices_per_question)
+            for c in range(choices_per_question):
+                choice_objs.append(Choice(
+                    question=question,
+                    choice_text=f'Option {c + 1}',
+                    is_correct=c == correct,
+                    order=c + 1,
+                ))
+        self.bulk_write('choices', Choice, choice_objs, batch_size)
+        for choice in choice_objs:
+            question = choice.question
+            _, choices = answer_keys[question.lesson_id].setdefault(question.id, (question.points, {}))
+            choices[choice.id] = choice.is_correct
+            _, _, sheet_choices = sheets[question.lesson_id].setdefault(
+                question.id, (question.question_text, question.points, [])
+            )
+            sheet_choices.append([choice.id, choice.choice_text, choice.is_correct])
+
+        user_objs = self.bulk_write('learners', User, [
+            User(username=f'{prefix}{n + 1}', password='!', first_name='Learner', last_name=str(n + 1))
+            for n in range(learners)
+        ], batch_size)
+        self.bulk_write('learner profiles', Learner, [Learner(user=user) for user in user_objs], batch_size)
+
+        if submissions:
+            self.generate_submissions(rng, user_objs, lesson_objs, answer_keys, sheets, submissions, batch_size)
+            # Bulk writes bypass grading, so stats, progress and item analysis are built afterwards
+            stats_started = time.monotonic()
+            lesson_ids = [lesson.id for lesson in lesson_objs]
+            for offset in range(0, len(lesson_ids), 500):
+                with transaction.atomic():
+                    rebuild_lesson_stats(lesson_ids[offset:offset + 500])
+            with transaction.atomic():
+                rebuild_course_stats([course.id for course in course_objs])
+            user_ids = [user.id for user in user_objs]
+            for offset in range(0, len(user_ids), 500):
+                rebuild_progress(user_ids[offset:offset + 500])
+            read = refresh_item_analysis()
+            self.stdout.write(
+                f'stats, progress and item analysis: {read:,} answers in {time.monotonic() - stats_started:.2f}s'
+            )
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f'\n✓ Synthetic dataset created in {elapsed:.1f}s'))
+
+    def generate_submissions(self, rng, users, lessons, answer_keys, sheets, total, batch_size):
+        """Write graded submissions and their answers in chunked transactions."""
+        lesson_order = list(lessons)
+        rng.shuffle(lesson_order)
+        # Each learner answers correctly with their own probability, which
+        # gives item statistics something realistic to measure.
+        ability = {user.id: rng.uniform(0.3, 0.95) for user in users}
+        questions_per_submission = max(1, len(next(iter(answer_keys.values()))))
+        chunk = max(1, batch_size // questions_per_submission)
+
+        # (question id, correct choice id, wrong choice ids) per lesson
+        options = {
+            lesson_id: [
+                (
+                    question_id,
+                    next(choice_id for choice_id, is_correct in choices.items() if is_correct),
+                    [choice_id for choice_id, is_correct in choices.items() if not is_correct],
+                )
+                for question_id, (_, choices) in answer_key.items()
+            ]
+            for lesson_id, answer_key in answer_keys.items()
+        }
+
+        started = last_report = time.monotonic()
+        answers_written = 0
+        now = timezone.now()
+
+        for offset in range(0, total, chunk):
+            submission_objs = []
+            results = []
+            for index in range(offset, min(offset + chunk, total)):
+                # Index -> (learner, lesson) is a bijection, so pairs never repeat
+                user = users[index % len(users)]
+                lesson = lesson_order[index // len(users)]
+                answer_key = answer_keys[lesson.id]
+
+                p_correct = ability[user.id]
+                responses = {
+                    question_id: correct if rng.random() < p_correct else rng.choice(wrong)
+                    for question_id, correct, wrong in options[lesson.id]
+                }
+
+                result = score_responses(answer_key, responses)
+                results.append(result)
+                submission_objs.append(Submission(
+                    student=user,
+                    lesson=lesson,
+                    status='GRADED',
+                    score=result['score'],
+                    total_questions=result['total_questions'],
+                    correct_answers=result['correct_answers'],
+                    result_snapshot=build_snapshot(sheets[lesson.id], result['answers']),
+                    submitted_at=now,
+                    graded_at=now,
+                ))
+
+            with transaction.atomic():
+                Submission.objects.bulk_create(submission_objs)
+                written = insert_answers(
+                    ((submission.id, result) for submission, result in zip(submission_objs, results)), now
+                )
+
+            answers_written += written
+            done = offset + len(submission_objs)
+            current = time.monotonic()
+            if current - last_report < 1 and done < total:
+                continue
+            last_report = current
+            elapsed = current - started
+            self.stdout.write(
+                f'submissions: {done:,}/{total:,}, answers: {answers_written:,} '
+                f'({answers_written / elapsed if elapsed else 0:,.0f} answers/s)'
+            )
+
+    def bulk_write(self, label, model, objs, batch_size):
+        """bulk_create ``objs`` in chunked transactions, reporting throughput."""
+        started = time.monotonic()
+        for offset in range(0, len(objs), batch_size):
+            with transaction.atomic():
+                model.objects.bulk_create(objs[offset:offset + batch_size])
+        elapsed = time.monotonic() - started
+        rate = len(objs) / elapsed if elapsed else 0
+        self.stdout.write(f'{label}: {len(objs):,} rows in {elapsed:.2f}s ({rate:,.0f} rows/s)')
+        return objs
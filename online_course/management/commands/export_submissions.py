@@ -0,0 +1,45 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from online_course.exports import FORMATS, parse_boundary, stream_export
+
+
+class Command(BaseCommand):
+    help = 'Stream submissions joined with their answers as CSV or JSON Lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=FORMATS, default='csv')
+        parser.add_argument('--gzip', action='store_true', help='Gzip-compress the output')
+        parser.add_argument('--output', '-o', help='File to write (default: stdout)')
+        parser.add_argument('--course', type=int, help='Only submissions for this course id')
+        parser.add_argument('--lesson', type=int, help='Only submissions for this lesson id')
+        parser.add_argument('--since', help='Submitted at or after this ISO date/datetime')
+        parser.add_argument('--until', help='Submitted before this ISO date/datetime (dates are inclusive)')
+        parser.add_argument('--page-size', type=int, default=5000, help='Rows fetched per keyset page')
+
+    def handle(self, *args, **options):
+        try:
+            since = parse_boundary(options['since']) if options['since'] else None
+            until = parse_boundary(options['until'], end=True) if options['until'] else None
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        chunks = stream_export(
+            options['format'],
+            compress=options['gzip'],
+            course_id=options['course'],
+            lesson_id=options['lesson'],
+            since=since,
+            until=until,
+            page_size=options['page_size'],
+        )
+
+        if options['output']:
+            with open(options['output'], 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+        else:
+            out = sys.stdout.buffer
+            for chunk in chunks:
+                out.write(chunk)
+            out.flush()
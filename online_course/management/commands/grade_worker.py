@@ -0,0 +1,70 @@
+import logging
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from online_course.grading import grade_pending_submissions
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Run a local pool of workers that grade SUBMITTED exam submissions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Number of grading threads')
+        parser.add_argument('--batch-size', type=int, default=50, help='Submissions claimed per transaction')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is drained')
+
+    def handle(self, *args, **options):
+        self.stop = threading.Event()
+        self.lock = threading.Lock()
+        self.graded = 0
+        workers = max(1, options['workers'])
+
+        self.stdout.write(self.style.SUCCESS(f'Starting {workers} grading worker(s)...'))
+
+        if workers == 1:
+            self.work(options)
+        else:
+            threads = [
+                threading.Thread(target=self.work, args=(options,), name=f'grade-worker-{i}', daemon=True)
+                for i in range(workers)
+            ]
+            for thread in threads:
+                thread.start()
+            try:
+                for thread in threads:
+                    while thread.is_alive():
+                        thread.join(timeout=0.5)
+            except KeyboardInterrupt:
+                self.stop.set()
+                for thread in threads:
+                    thread.join()
+
+        self.stdout.write(self.style.SUCCESS(f'Graded {self.graded} submission(s)'))
+
+    def work(self, options):
+        try:
+            while not self.stop.is_set():
+                try:
+                    graded = grade_pending_submissions(batch_size=options['batch_size'])
+                except Exception:
+                    # Keep the worker alive through a lost connection and the like
+                    logger.exception('Grading batch failed')
+                    connection.close()
+                    graded = 0
+                if graded:
+                    with self.lock:
+                        self.graded += graded
+                    continue
+                if options['once']:
+                    break
+                self.stop.wait(options['poll_interval'])
+        except KeyboardInterrupt:
+            self.stop.set()
+        finally:
+            # Each thread owns its own connection; close it on the way out
+            if threading.current_thread() is not threading.main_thread():
+                connection.close()
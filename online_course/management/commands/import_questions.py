@@ -0,0 +1,47 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from online_course.question_bank import (
+    FORMATS, QuestionBankError, import_question_bank, parse_question_bank, validate_question_bank,
+)
+
+
+class Command(BaseCommand):
+    help = 'Import a JSON, CSV or YAML question bank, upserting questions by their key'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Question bank file')
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk write')
+        parser.add_argument('--dry-run', action='store_true', help='Validate only; write nothing')
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or guess_format(options['path'])
+        if fmt is None:
+            raise CommandError('Cannot infer the format from the file name; pass --format.')
+
+        started = time.monotonic()
+        try:
+            with open(options['path'], 'rb') as f:
+                records = parse_question_bank(f.read(), fmt)
+            if options['dry_run']:
+                validate_question_bank(records)
+                self.stdout.write(self.style.SUCCESS(f'{len(records)} question(s) are valid'))
+                return
+            counts = import_question_bank(records, batch_size=options['batch_size'])
+        except QuestionBankError as e:
+            for error in e.errors:
+                self.stderr.write(error)
+            raise CommandError(f'Import aborted: {len(e.errors)} problem(s) found, nothing was written.')
+
+        elapsed = time.monotonic() - started
+        summary = ', '.join(f'{value} {name.replace("_", " ")}' for name, value in counts.items())
+        self.stdout.write(self.style.SUCCESS(f'Imported {len(records)} question(s) in {elapsed:.1f}s: {summary}'))
+
+
+def guess_format(path):
+    extension = os.path.splitext(path)[1].lower().lstrip('.')
+    if extension == 'yml':
+        extension = 'yaml'
+    return extension if extension in FORMATS else None
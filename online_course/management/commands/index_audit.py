@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from online_course.benchmarks import SCENARIOS, audit_indexes
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN the queries of the benchmark scenarios and report full table scans and unindexed sorts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=100, help='Lessons (and learners) in the generated dataset')
+        parser.add_argument('--questions-per-lesson', type=int, default=20)
+        parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='Comma-separated scenarios to audit')
+        parser.add_argument('--all', action='store_true', help='Print every plan, not only flagged ones')
+        parser.add_argument('--fail-on-warnings', action='store_true',
+                            help='Exit with an error if any query scans a table or sorts without an index')
+
+    def handle(self, *args, **options):
+        scenarios = [name for name in options['scenarios'].split(',') if name]
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f'Unknown scenarios: {", ".join(sorted(unknown))}')
+
+        # The dataset goes into a throwaway test database, never the real one
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            audit = audit_indexes(
+                options['size'], scenarios=scenarios, questions_per_lesson=options['questions_per_lesson'],
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        flagged = sum(self.report(name, results, options['all']) for name, results in audit.items())
+        if options['fail_on_warnings'] and flagged:
+            raise CommandError(f'{flagged} query shape(s) scan a table or sort without an index')
+
+    def report(self, name, results, show_all):
+        flagged = [result for result in results if result['warnings']]
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{name}: {len(results)} query shape(s), {len(flagged)} flagged'
+        ))
+        for result in results if show_all else flagged:
+            self.stdout.write(f'  x{result["count"]} {result["ms"]:.1f}ms {result["fingerprint"]}')
+            for line in result['plan']:
+                self.stdout.write(f'      {line}')
+            for warning in result['warnings']:
+                self.stdout.write(self.style.WARNING(f'    ! {warning}'))
+        return len(flagged)
@@ -0,0 +1,30 @@
+import sys
+
+from django.core.management.base import BaseCommand
+from online_course.ingest import ingest_submissions
+
+
+class Command(BaseCommand):
+    help = 'Grade and store exams taken offline from a JSON Lines file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='JSONL file of {student, lesson, answers} records, or - for stdin')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Records written per transaction')
+
+    def handle(self, *args, **options):
+        # Lines are decoded one by one, so a line that is not UTF-8 is only that line's error
+        if options['path'] == '-':
+            summary = self.ingest(sys.stdin.buffer, options)
+        else:
+            with open(options['path'], 'rb') as f:
+                summary = self.ingest(f, options)
+
+        style = self.style.WARNING if summary['failed'] else self.style.SUCCESS
+        self.stdout.write(style(f'Ingested {summary["ingested"]} submission(s), rejected {summary["failed"]}'))
+
+    def ingest(self, lines, options):
+        return ingest_submissions(
+            lines,
+            chunk_size=options['chunk_size'],
+            on_error=lambda line_no, message: self.stderr.write(f'line {line_no}: {message}'),
+        )
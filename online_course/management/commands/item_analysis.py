@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from online_course.item_analysis import refresh_item_analysis
+from online_course.models import QuestionStats
+
+
+class Command(BaseCommand):
+    help = 'Compute per-question difficulty, choice distribution and discrimination'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Recompute every question instead of only newly graded ones')
+        parser.add_argument('--chunk-size', type=int, default=10000, help='Answers fetched and accumulated per chunk')
+        parser.add_argument('--show', type=int, default=0, help='Print the N least discriminating questions')
+
+    def handle(self, *args, **options):
+        read = refresh_item_analysis(full=options['full'], chunk_size=options['chunk_size'], log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(f'Processed {read:,} answer(s)'))
+
+        if options['show']:
+            stats = sorted(
+                (s for s in QuestionStats.objects.select_related('question') if s.discrimination is not None),
+                key=lambda s: s.discrimination,
+            )
+            for s in stats[:options['show']]:
+                self.stdout.write(
+                    f'Q{s.question_id:<8} difficulty={s.difficulty:.3f} '
+                    f'discrimination={s.discrimination:+.3f} answered={s.answered} {s.question}'
+                )
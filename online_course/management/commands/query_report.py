@@ -0,0 +1,58 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from online_course.query_inspector import build_report
+
+
+class Command(BaseCommand):
+    help = 'Summarize the query inspector log per view: query counts, duplicate and slow queries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--log', help='JSON Lines log written by the query inspector (default: QUERY_INSPECTOR_LOG)')
+        parser.add_argument('--view', help='Only report views whose URL name contains this')
+        parser.add_argument('--fail-on-duplicates', action='store_true',
+                            help='Exit with an error if any duplicate queries were found')
+
+    def handle(self, *args, **options):
+        path = options['log'] or getattr(settings, 'QUERY_INSPECTOR_LOG', None)
+        if not path:
+            raise CommandError('No log file: pass --log or set QUERY_INSPECTOR_LOG')
+        try:
+            with open(path, encoding='utf-8') as f:
+                entries = [json.loads(line) for line in f if line.strip()]
+        except FileNotFoundError:
+            raise CommandError(f'{path} does not exist')
+
+        if options['view']:
+            entries = [entry for entry in entries if options['view'] in entry['view']]
+        report = build_report(entries)
+        if not report:
+            self.stdout.write('No requests logged')
+            return
+
+        duplicated_views = 0
+        for view, stats in sorted(report.items(), key=lambda item: -item[1]['db_ms']):
+            average = stats['queries'] / stats['requests']
+            self.stdout.write(self.style.MIGRATE_HEADING(view))
+            self.stdout.write(
+                f'  requests={stats["requests"]} queries avg={average:.1f} max={stats["max_queries"]} '
+                f'db avg={stats["db_ms"] / stats["requests"]:.1f}ms'
+            )
+            if stats['duplicates']:
+                duplicated_views += 1
+            for sql, found in sorted(stats['duplicates'].items(), key=lambda item: -item[1]['max_count']):
+                self.stdout.write(self.style.WARNING(
+                    f'  duplicate x{found["max_count"]} in {found["requests"]} request(s): {sql}'
+                ))
+                for origin in sorted(found['origins']):
+                    self.stdout.write(f'      at {origin}')
+            for sql, found in sorted(stats['slow'].items(), key=lambda item: -item[1]['max_ms']):
+                self.stdout.write(self.style.WARNING(
+                    f'  slow max {found["max_ms"]:.1f}ms in {found["requests"]} request(s): {sql}'
+                ))
+                for origin in sorted(found['origins']):
+                    self.stdout.write(f'      at {origin}')
+
+        if options['fail_on_duplicates'] and duplicated_views:
+            raise CommandError(f'Duplicate queries found in {duplicated_views} view(s)')
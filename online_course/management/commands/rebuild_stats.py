@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from online_course.stats import rebuild_stats
+
+
+class Command(BaseCommand):
+    help = 'Rebuild lesson and course statistics from graded submissions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help='Lessons or courses aggregated per transaction')
+
+    def handle(self, *args, **options):
+        lessons, courses = rebuild_stats(chunk_size=options['chunk_size'], log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt stats for {lessons} lesson(s) and {courses} course(s)'))
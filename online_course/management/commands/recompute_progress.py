@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from online_course.progress import recompute_progress
+
+
+class Command(BaseCommand):
+    help = "Rebuild every learner's course progress from graded submissions"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help='Learners rebuilt per transaction')
+        parser.add_argument('--workers', type=int, default=4, help='Number of threads rebuilding chunks')
+
+    def handle(self, *args, **options):
+        users, rows = recompute_progress(
+            chunk_size=options['chunk_size'], workers=options['workers'], log=self.stdout.write
+        )
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt progress for {users} learner(s): {rows} course row(s)'))
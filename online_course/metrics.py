@@ -0,0 +1,263 @@
+"""
+Per-view request metrics exposed in the Prometheus text format.
+
+MetricsMiddleware times each sampled request and records, labelled by the
+resolved URL name (e.g. ``online_course:submit``):
+
+- wall time, DB time and template render time, in seconds
+- the number of DB queries
+- the response size in bytes
+
+Each goes into a histogram in an in-process registry, which the ``/metrics``
+view renders for Prometheus to scrape. Sampled responses also get a
+``Server-Timing`` header so the breakdown shows up in browser dev tools.
+
+Settings:
+
+- ``METRICS_ENABLED``: off by default. When off, the middleware removes
+  itself at startup and costs nothing.
+- ``METRICS_SAMPLE_RATE``: the fraction of requests measured. Unsampled
+  requests pay for one random() call.
+- ``METRICS_SERVER_TIMING``: whether to emit the ``Server-Timing`` header.
+- ``METRICS_TOKEN``: when set, scrapers authenticate with
+  ``Authorization: Bearer <token>``. Staff users can always read the
+  endpoint.
+
+The registry lives in process memory, so every worker process exposes its
+own numbers; scrape each worker or aggregate in Prometheus.
+"""
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from . import query_hooks
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# name: (help, buckets)
+HISTOGRAMS = {
+    'online_course_request_duration_seconds': ('Wall time spent handling the request', DURATION_BUCKETS),
+    'online_course_db_queries': ('Database queries run per request', QUERY_BUCKETS),
+    'online_course_db_duration_seconds': ('Time spent in database queries per request', DURATION_BUCKETS),
+    'online_course_template_duration_seconds': ('Time spent rendering templates per request', DURATION_BUCKETS),
+    'online_course_response_size_bytes': ('Size of the response body', SIZE_BUCKETS),
+}
+REQUESTS_TOTAL = 'online_course_requests_total'
+
+# Timing of the request being measured in the current thread/task, if any
+current_timing = ContextVar('current_timing', default=None)
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+
+def _labels(labels):
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return ','.join(f'{name}="{escape(value)}"' for name, value in labels)
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    """Thread-safe store of the histograms and request counters."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self.histograms = {}
+        self.requests = {}
+
+    def record(self, view, method, status, observations):
+        """Record one request; ``observations`` maps histogram names to values."""
+        with self.lock:
+            key = (('view', view), ('method', method), ('status', status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+            for name, value in observations.items():
+                histogram = self.histograms.get((name, view))
+                if histogram is None:
+                    histogram = self.histograms[(name, view)] = Histogram(HISTOGRAMS[name][1])
+                histogram.observe(value)
+
+    def render(self):
+        """Render everything in the Prometheus text exposition format."""
+        with self.lock:
+            lines = [
+                f'# HELP {REQUESTS_TOTAL} Requests measured, by view, method and status',
+                f'# TYPE {REQUESTS_TOTAL} counter',
+            ]
+            for key, count in sorted(self.requests.items()):
+                lines.append(f'{REQUESTS_TOTAL}{{{_labels(key)}}} {count}')
+
+            for name, (help_text, _) in HISTOGRAMS.items():
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} histogram')
+                for (metric, view), histogram in sorted(self.histograms.items()):
+                    if metric != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        labels = _labels((('view', view), ('le', _number(bound))))
+                        lines.append(f'{name}_bucket{{{labels}}} {cumulative}')
+                    labels = _labels((('view', view), ('le', '+Inf')))
+                    lines.append(f'{name}_bucket{{{labels}}} {histogram.count}')
+                    lines.append(f'{name}_sum{{{_labels((("view", view),))}}} {_number(histogram.sum)}')
+                    lines.append(f'{name}_count{{{_labels((("view", view),))}}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+class RequestTiming:
+    __slots__ = ('queries', 'db_time', 'template_time', 'template_depth')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        """Database execute wrapper timing every query."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+
+
+_template_timing_installed = False
+
+
+def install_template_timing():
+    """
+    Time renders of Django templates for the request being measured.
+
+    Wraps the template backend's render() once per process. Nested renders
+    (a template tag rendering another template) are only counted once.
+    """
+    global _template_timing_installed
+    if _template_timing_installed:
+        return
+    from django.template.backends.django import Template
+
+    original = Template.render
+
+    def render(self, context=None, request=None):
+        timing = current_timing.get()
+        if timing is None:
+            return original(self, context, request)
+        timing.template_depth += 1
+        start = time.perf_counter()
+        try:
+            return original(self, context, request)
+        finally:
+            timing.template_depth -= 1
+            if not timing.template_depth:
+                timing.template_time += time.perf_counter() - start
+
+    Template.render = render
+    _template_timing_installed = True
+
+
+class MetricsMiddleware:
+    """
+    Record per-view timings for a sample of requests.
+
+    Runs sync or async, whichever the handler is; queries are timed in
+    whichever thread runs them (see query_hooks.py).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'METRICS_SAMPLE_RATE', 1.0)
+        self.server_timing = getattr(settings, 'METRICS_SERVER_TIMING', True)
+        install_template_timing()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        timing = RequestTiming()
+        token = current_timing.set(timing)
+        try:
+            with query_hooks.wrap_queries(timing):
+                start = time.perf_counter()
+                response = self.get_response(request)
+                elapsed = time.perf_counter() - start
+        finally:
+            current_timing.reset(token)
+        return self.record(request, response, timing, elapsed)
+
+    async def __acall__(self, request):
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return await self.get_response(request)
+
+        timing = RequestTiming()
+        token = current_timing.set(timing)
+        try:
+            with query_hooks.wrap_queries(timing):
+                start = time.perf_counter()
+                response = await self.get_response(request)
+                elapsed = time.perf_counter() - start
+        finally:
+            current_timing.reset(token)
+        return self.record(request, response, timing, elapsed)
+
+    def record(self, request, response, timing, elapsed):
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unresolved'
+        observations = {
+            'online_course_request_duration_seconds': elapsed,
+            'online_course_db_queries': timing.queries,
+            'online_course_db_duration_seconds': timing.db_time,
+            'online_course_template_duration_seconds': timing.template_time,
+        }
+        if not response.streaming:
+            observations['online_course_response_size_bytes'] = len(response.content)
+        REGISTRY.record(view, request.method, response.status_code, observations)
+
+        if self.server_timing:
+            response['Server-Timing'] = (
+                f'db;dur={timing.db_time * 1000:.1f};desc="{timing.queries} queries", '
+                f'tpl;dur={timing.template_time * 1000:.1f}, '
+                f'total;dur={elapsed * 1000:.1f}'
+            )
+        return response
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 09:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('online_course', '0002_instructor_learner_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submission',
+            name='responses',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
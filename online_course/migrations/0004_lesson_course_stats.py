@@ -0,0 +1,44 @@
+# Generated by Django 4.2 on 2026-10-18 09:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('online_course', '0003_submission_responses'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LessonStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('passed', models.PositiveIntegerField(default=0)),
+                ('score_total', models.BigIntegerField(default=0)),
+                ('last_graded_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('lesson', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='online_course.lesson')),
+            ],
+            options={
+                'verbose_name_plural': 'lesson stats',
+            },
+        ),
+        migrations.CreateModel(
+            name='CourseStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('passed', models.PositiveIntegerField(default=0)),
+                ('score_total', models.BigIntegerField(default=0)),
+                ('last_graded_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('course', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='online_course.course')),
+            ],
+            options={
+                'verbose_name_plural': 'course stats',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 09:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('online_course', '0005_question_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='external_key',
+            field=models.CharField(blank=True, help_text='Stable identifier used by question bank imports', max_length=100, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-18 10:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('online_course', '0006_question_external_key'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['-submitted_at', '-id'], name='online_cour_submitt_9cc026_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2 on 2026-10-18 10:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('online_course', '0007_submission_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='choice',
+            options={'ordering': ['question_id', 'order']},
+        ),
+        migrations.AlterModelOptions(
+            name='question',
+            options={'ordering': ['lesson_id', 'order']},
+        ),
+        migrations.AddIndex(
+            model_name='choice',
+            index=models.Index(fields=['question', 'order'], name='online_cour_questio_bcb513_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['-created_at'], name='online_cour_created_f914a9_idx'),
+        ),
+    ]
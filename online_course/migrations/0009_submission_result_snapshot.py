@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 10:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('online_course', '0008_audited_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submission',
+            name='result_snapshot',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2 on 2026-10-18 10:58
+
+from django.conf import settings
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('online_course', '0010_course_progress'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='submission',
+            name='online_cour_student_342619_idx',
+        ),
+        migrations.AlterUniqueTogether(
+            name='submission',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='lesson',
+            name='max_attempts',
+            field=models.PositiveIntegerField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='attempt',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AlterUniqueTogether(
+            name='submission',
+            unique_together={('student', 'lesson', 'attempt')},
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2 on 2026-10-18 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('online_course', '0012_submission_failed_status'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='questionstats',
+            name='last_answer_id',
+        ),
+        migrations.AddField(
+            model_name='questionstats',
+            name='graded_through',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['status', 'graded_at'], name='online_cour_status_0535fe_idx'),
+        ),
+    ]
@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.contrib.auth.models import User
 
@@ -33,6 +35,19 @@ class Learner(models.Model):
         ordering = ['-enrollment_date']
 
 
+class CourseQuerySet(models.QuerySet):
+    def with_lesson_counts(self):
+        """
+        Annotate ``lesson_count`` with a correlated subquery rather than a
+        JOIN and GROUP BY, so Meta.ordering still applies and the -created_at
+        index serves the sort.
+        """
+        lessons = Lesson.objects.filter(course=OuterRef('pk')).order_by().values('course').annotate(
+            count=Count('id')
+        ).values('count')
+        return self.annotate(lesson_count=Coalesce(Subquery(lessons), 0))
+
+
 class Course(models.Model):
     """Model for storing course information"""
     name = models.CharField(max_length=100)
@@ -40,11 +55,16 @@ class Course(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CourseQuerySet.as_manager()
+
     def __str__(self):
         return self.name
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at']),
+        ]
 
 
 class Lesson(models.Model):
@@ -54,6 +74,8 @@ class Lesson(models.Model):
     description = models.TextField()
     content = models.TextField()
     order = models.IntegerField(default=0)
+    # Exam attempts allowed per learner; empty uses settings.EXAM_MAX_ATTEMPTS
+    max_attempts = models.PositiveIntegerField(null=True, blank=True, validators=[MinValueValidator(1)])
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -80,6 +102,8 @@ class Question(models.Model):
     question_type = models.CharField(max_length=2, choices=QUESTION_TYPE_CHOICES, default='MC')
     points = models.IntegerField(default=1, validators=[MinValueValidator(1)])
     order = models.IntegerField(default=0)
+    external_key = models.CharField(max_length=100, unique=True, null=True, blank=True,
+                                    help_text='Stable identifier used by question bank imports')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -87,7 +111,8 @@ class Question(models.Model):
         return self.question_text[:50]
 
     class Meta:
-        ordering = ['order']
+        # lesson_id first so prefetches over several lessons read the index in order instead of sorting
+        ordering = ['lesson_id', 'order']
         indexes = [
             models.Index(fields=['lesson', 'order']),
         ]
@@ -106,7 +131,11 @@ class Choice(models.Model):
         return self.choice_text[:50]
 
     class Meta:
-        ordering = ['order']
+        # Same as Question: per-question order, served by the index below
+        ordering = ['question_id', 'order']
+        indexes = [
+            models.Index(fields=['question', 'order']),
+        ]
 
 
 class Submission(models.Model):
@@ -115,28 +144,37 @@ class Submission(models.Model):
         ('IN_PROGRESS', 'In Progress'),
         ('SUBMITTED', 'Submitted'),
         ('GRADED', 'Graded'),
+        ('FAILED', 'Grading failed'),
     )
     
     student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='exam_submissions')
     lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, related_name='submissions')
+    attempt = models.PositiveIntegerField(default=1)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='IN_PROGRESS')
     score = models.IntegerField(default=0, validators=[MinValueValidator(0), MaxValueValidator(100)])
     total_questions = models.IntegerField(default=0)
     correct_answers = models.IntegerField(default=0)
+    responses = models.JSONField(null=True, blank=True)
+    # Questions, choices and answers as graded; see results.py
+    result_snapshot = models.JSONField(null=True, blank=True, editable=False)
     submitted_at = models.DateTimeField(null=True, blank=True)
     graded_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
-        return f"{self.student.username} - {self.lesson.title}"
+        return f"{self.student.username} - {self.lesson.title} (attempt {self.attempt})"
 
     class Meta:
         ordering = ['-submitted_at']
-        unique_together = ('student', 'lesson')
+        # Also the index behind latest/best attempt lookups (see attempts.py)
+        unique_together = ('student', 'lesson', 'attempt')
         indexes = [
-            models.Index(fields=['student', 'lesson']),
             models.Index(fields=['status', '-submitted_at']),
+            # Submissions graded since the last item analysis refresh
+            models.Index(fields=['status', 'graded_at']),
+            # Keyset pagination in the admin changelist
+            models.Index(fields=['-submitted_at', '-id']),
         ]
 
 
@@ -155,3 +193,102 @@ class SubmissionAnswer(models.Model):
 
     class Meta:
         unique_together = ('submission', 'question')
+
+
+class AggregateStats(models.Model):
+    """Running totals over graded submissions, updated with F() increments"""
+    attempts = models.PositiveIntegerField(default=0)
+    passed = models.PositiveIntegerField(default=0)
+    score_total = models.BigIntegerField(default=0)
+    last_graded_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def average_score(self):
+        return round(self.score_total / self.attempts, 1) if self.attempts else 0
+
+    @property
+    def pass_rate(self):
+        return round(self.passed * 100 / self.attempts, 1) if self.attempts else 0
+
+    class Meta:
+        abstract = True
+
+
+class LessonStats(AggregateStats):
+    """Model for storing denormalized exam statistics per lesson"""
+    lesson = models.OneToOneField(Lesson, on_delete=models.CASCADE, related_name='stats')
+
+    def __str__(self):
+        return f"Stats: {self.lesson.title}"
+
+    class Meta:
+        verbose_name_plural = 'lesson stats'
+
+
+class CourseStats(AggregateStats):
+    """Model for storing denormalized exam statistics per course"""
+    course = models.OneToOneField(Course, on_delete=models.CASCADE, related_name='stats')
+
+    def __str__(self):
+        return f"Stats: {self.course.name}"
+
+    class Meta:
+        verbose_name_plural = 'course stats'
+
+
+class CourseProgress(models.Model):
+    """Model for storing a learner's progress through a course, updated as exams are graded"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='course_progress')
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='learner_progress')
+    lessons_passed = models.PositiveIntegerField(default=0)
+    best_score = models.IntegerField(default=0, validators=[MinValueValidator(0), MaxValueValidator(100)])
+    last_activity_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Progress: {self.user.username} - {self.course.name}"
+
+    class Meta:
+        unique_together = ('user', 'course')
+        verbose_name_plural = 'course progress'
+
+
+class QuestionStats(models.Model):
+    """Model for storing item analysis accumulators per question"""
+    question = models.OneToOneField(Question, on_delete=models.CASCADE, related_name='stats')
+    answered = models.PositiveIntegerField(default=0)
+    correct = models.PositiveIntegerField(default=0)
+    score_sum = models.FloatField(default=0)
+    score_sq_sum = models.FloatField(default=0)
+    correct_score_sum = models.FloatField(default=0)
+    choice_counts = models.JSONField(default=dict, blank=True)
+    # Refreshes recompute questions answered in submissions graded after this; see item_analysis.py
+    graded_through = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def difficulty(self):
+        """Proportion of answers that were correct (the item's p-value)"""
+        return round(self.correct / self.answered, 3) if self.answered else None
+
+    @property
+    def discrimination(self):
+        """Point-biserial correlation between correctness and total score"""
+        wrong = self.answered - self.correct
+        if not self.correct or not wrong:
+            return None
+        mean = self.score_sum / self.answered
+        variance = self.score_sq_sum / self.answered - mean ** 2
+        if variance <= 0:
+            return None
+        mean_correct = self.correct_score_sum / self.correct
+        mean_wrong = (self.score_sum - self.correct_score_sum) / wrong
+        p = self.correct / self.answered
+        return round((mean_correct - mean_wrong) / variance ** 0.5 * (p * (1 - p)) ** 0.5, 3)
+
+    def __str__(self):
+        return f"Item stats: {self.question}"
+
+    class Meta:
+        verbose_name_plural = 'question stats'
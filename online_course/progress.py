@@ -0,0 +1,192 @@
+"""
+Per-learner progress through each course.
+
+CourseProgress holds, per (user, course), the number of lessons passed, the
+best exam score and the time of the last graded exam. Grading updates the row
+in place with F() increments and Greatest(), never by recounting submissions;
+a batch takes one UPDATE per INCREMENT_BATCH (user, course) rows.
+A lesson counts as passed once, on its first passing grade.
+
+``Learner.progress`` is the learner's overall figure: lessons passed as a
+percentage of the lessons in the courses they have taken exams in. It is
+refreshed from the CourseProgress rows in the same UPDATE that sets it.
+
+recompute_progress() rebuilds everything from graded submissions, learners
+``chunk_size`` at a time on a pool of threads, e.g. to backfill existing data
+or after bulk imports that bypass grading.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import Case, Count, F, IntegerField, Max, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest, Least
+from django.utils import timezone
+
+from .grading import PASSING_SCORE
+from .models import CourseProgress, Learner, Lesson, Submission
+
+# (user, course) rows per UPDATE: each adds a term to the WHERE clause's OR
+# chain and a WHEN to every CASE, and SQLite caps expression depth at 1000
+INCREMENT_BATCH = 200
+
+
+def _increment(progress):
+    """
+    Apply ``{(user_id, course_id): (lessons_passed, best_score, last_activity_at)}``
+    deltas: missing rows are inserted empty, then incremented by one UPDATE per
+    INCREMENT_BATCH rows.
+    """
+    CourseProgress.objects.bulk_create(
+        [CourseProgress(user_id=user_id, course_id=course_id) for user_id, course_id in progress],
+        ignore_conflicts=True,
+    )
+    items = list(progress.items())
+    for offset in range(0, len(items), INCREMENT_BATCH):
+        _increment_rows(items[offset:offset + INCREMENT_BATCH])
+
+
+def _increment_rows(items):
+    """One UPDATE for a batch of ``((user_id, course_id), totals)`` items."""
+    def case(expression):
+        return Case(*(
+            When(user_id=user_id, course_id=course_id, then=expression(*totals))
+            for (user_id, course_id), totals in items
+        ))
+
+    rows = Q()
+    for (user_id, course_id), _ in items:
+        rows |= Q(user_id=user_id, course_id=course_id)
+    CourseProgress.objects.filter(rows).update(
+        lessons_passed=case(lambda passed, score, at: F('lessons_passed') + passed),
+        best_score=case(lambda passed, score, at: Greatest('best_score', Value(score))),
+        last_activity_at=case(lambda passed, score, at: Greatest(Coalesce('last_activity_at', Value(at)), Value(at))),
+        updated_at=timezone.now(),
+    )
+
+
+def refresh_learner_progress(user_ids):
+    """Set ``Learner.progress`` of the given users from their CourseProgress rows, in one UPDATE."""
+    lessons = Lesson.objects.filter(course=OuterRef('course')).order_by().values('course').annotate(
+        count=Count('id')
+    ).values('count')
+    totals = CourseProgress.objects.filter(user=OuterRef('user')).order_by().values('user').annotate(
+        percent=Sum('lessons_passed') * 100 / Sum(Subquery(lessons, output_field=IntegerField()))
+    ).values('percent')
+    # Lessons deleted after being passed could push the share past 100
+    Learner.objects.filter(user_id__in=user_ids).update(
+        progress=Least(Coalesce(Subquery(totals, output_field=IntegerField()), 0), Value(100))
+    )
+
+
+def _first_passes(submissions):
+    """The (student, lesson) pairs passed for the first time by these submissions."""
+    passed = {
+        (submission.student_id, submission.lesson_id)
+        for submission in submissions
+        if submission.score >= PASSING_SCORE
+    }
+    if not passed:
+        return passed
+    earlier = Submission.objects.filter(
+        student_id__in={student_id for student_id, _ in passed},
+        lesson_id__in={lesson_id for _, lesson_id in passed},
+        status='GRADED',
+        score__gte=PASSING_SCORE,
+    ).exclude(pk__in=[submission.pk for submission in submissions]).values_list('student_id', 'lesson_id')
+    return passed - set(earlier)
+
+
+def record_progress(submission):
+    """Add a newly graded submission to its learner's course progress."""
+    record_progress_batch([submission])
+
+
+def record_progress_batch(submissions):
+    """
+    Add a batch of newly graded submissions to their learners' progress,
+    with one increment per (user, course).
+    """
+    first_passes = _first_passes(submissions)
+    progress = {}
+    for submission in submissions:
+        key = (submission.student_id, submission.lesson.course_id)
+        pair = (submission.student_id, submission.lesson_id)
+        first_pass = submission.score >= PASSING_SCORE and pair in first_passes
+        if first_pass:
+            first_passes.discard(pair)
+        lessons_passed, best_score, last_activity_at = progress.get(key, (0, 0, None))
+        progress[key] = (
+            lessons_passed + (1 if first_pass else 0),
+            max(best_score, submission.score),
+            max(last_activity_at, submission.graded_at) if last_activity_at else submission.graded_at,
+        )
+    _increment(progress)
+    refresh_learner_progress({user_id for user_id, _ in progress})
+
+
+def rebuild_progress(user_ids):
+    """Recompute the CourseProgress rows of the given users with one aggregate query."""
+    rows = (
+        Submission.objects.filter(student_id__in=user_ids, status='GRADED')
+        .order_by()
+        .values('student_id', 'lesson__course_id')
+        .annotate(
+            lessons_passed=Count('lesson_id', distinct=True, filter=Q(score__gte=PASSING_SCORE)),
+            best_score=Max('score'),
+            last_activity_at=Max('graded_at'),
+        )
+    )
+    progress = [
+        CourseProgress(
+            user_id=row['student_id'],
+            course_id=row['lesson__course_id'],
+            lessons_passed=row['lessons_passed'],
+            best_score=row['best_score'],
+            last_activity_at=row['last_activity_at'],
+        )
+        for row in rows
+    ]
+    with transaction.atomic():
+        # Courses whose submissions have all been deleted lose their row
+        CourseProgress.objects.filter(user_id__in=user_ids).delete()
+        CourseProgress.objects.bulk_create(progress)
+        refresh_learner_progress(user_ids)
+    return len(progress)
+
+
+def _rebuild_chunk(user_ids, in_thread):
+    try:
+        return rebuild_progress(user_ids)
+    finally:
+        # Each pool thread owns its own connection; close it on the way out
+        if in_thread:
+            connection.close()
+
+
+def recompute_progress(chunk_size=500, workers=4, log=None):
+    """
+    Rebuild every learner's progress from graded submissions.
+
+    Users are split into chunks of ``chunk_size``, each rebuilt in its own
+    transaction by one of ``workers`` threads. Returns ``(users, rows)``.
+    """
+    ids = list(User.objects.order_by('id').values_list('id', flat=True))
+    chunks = [ids[offset:offset + chunk_size] for offset in range(0, len(ids), chunk_size)]
+    users = rows = 0
+
+    def done(user_ids, written):
+        nonlocal users, rows
+        users += len(user_ids)
+        rows += written
+        if log:
+            log(f'learners: {users:,}/{len(ids):,}, progress rows: {rows:,}')
+
+    if workers <= 1:
+        for user_ids in chunks:
+            done(user_ids, _rebuild_chunk(user_ids, in_thread=False))
+    else:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='recompute-progress') as pool:
+            for user_ids, written in zip(chunks, pool.map(_rebuild_chunk, chunks, [True] * len(chunks))):
+                done(user_ids, written)
+    return users, rows
@@ -0,0 +1,45 @@
+"""
+Database execute wrappers that follow a request into every thread it uses.
+
+Connections are per thread. Under ASGI a request's queries run in
+sync_to_async worker threads, not in the thread its middleware runs in, so a
+wrapper the middleware enters with ``connection.execute_wrapper()`` misses
+them. wrap_queries() instead keeps the wrapper in a context variable, which
+sync_to_async copies into the worker thread, and a dispatcher installed on
+every connection as it is opened runs the wrappers of the current context.
+Outside wrap_queries() the dispatcher costs one context variable lookup per
+query.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+# Wrappers of the current request, outermost first
+_wrappers = ContextVar('query_wrappers', default=())
+
+
+def _dispatch(execute, sql, params, many, context):
+    wrappers = _wrappers.get()
+    for wrapper in reversed(wrappers):
+        execute = partial(wrapper, execute)
+    return execute(sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_dispatcher(sender, connection, **kwargs):
+    if _dispatch not in connection.execute_wrappers:
+        # First, so that execute_wrapper() blocks open around it still pop their own
+        connection.execute_wrappers.insert(0, _dispatch)
+
+
+@contextmanager
+def wrap_queries(wrapper):
+    """Run ``wrapper`` around the queries of the current context, in whichever thread they run."""
+    token = _wrappers.set(_wrappers.get() + (wrapper,))
+    try:
+        yield
+    finally:
+        _wrappers.reset(token)
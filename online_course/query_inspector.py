@@ -0,0 +1,300 @@
+"""
+Development/staging detector for slow and duplicate SQL.
+
+QueryInspectorMiddleware captures every statement a request runs. Each one
+is fingerprinted by replacing literals and placeholders with ``?`` and
+collapsing IN lists and multi-row VALUES, so the same query with different
+parameters gets the same fingerprint. A fingerprint executed
+``QUERY_INSPECTOR_DUPLICATE_THRESHOLD`` or more times in one request is
+flagged as a duplicate; that is the signature of an N+1 loop. Any statement
+slower than ``QUERY_INSPECTOR_SLOW_MS`` is flagged as slow.
+
+Requests with findings are logged as warnings. Every request is also
+appended as one JSON line to ``QUERY_INSPECTOR_LOG``, if that setting is
+set, and ``manage.py query_report`` summarizes the file per view.
+
+Each query records the first stack frame in project code that issued it.
+That makes this too slow for production; enable it with
+``QUERY_INSPECTOR_ENABLED`` in development and staging only.
+
+explain_queries() runs EXPLAIN on captured queries and flags full table
+scans and sorts that no index serves; ``manage.py index_audit`` applies it
+to the benchmark scenarios.
+"""
+import json
+import logging
+import re
+import threading
+import time
+import traceback
+from collections import Counter, defaultdict
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from . import query_hooks
+
+logger = logging.getLogger(__name__)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'(?<![\w."])-?\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%s|\?')
+_IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_VALUES = re.compile(r'(\(\s*\?(?:\s*,\s*\?)*\s*\))(?:\s*,\s*\(\s*\?(?:\s*,\s*\?)*\s*\))+')
+_SPACE = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """Normalize a SQL statement so that only its shape remains."""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _PLACEHOLDER.sub('?', sql)
+    sql = _VALUES.sub(r'\1', sql)
+    sql = _IN_LIST.sub('(...)', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+# Transaction control statements repeat legitimately and are never N+1s
+_TRANSACTION = re.compile(r'^\s*(BEGIN|COMMIT|ROLLBACK|SAVEPOINT|RELEASE)\b', re.IGNORECASE)
+
+# Middleware frames enclose every query, so they never explain one
+_MIDDLEWARE_FILES = {__file__, str(Path(__file__).with_name('metrics.py'))}
+
+
+def _origin():
+    """
+    The innermost stack frame in project code that ran the query, as
+    ``path:line in func``, or None for queries run entirely by Django, such
+    as the admin's. Frames from the cursor wrapper inwards belong to execute
+    wrappers and are ignored.
+    """
+    root = str(Path(settings.BASE_DIR))
+    stack = traceback.extract_stack()
+    for index, frame in enumerate(stack):
+        if frame.filename.replace('\\', '/').endswith('django/db/backends/utils.py'):
+            stack = stack[:index]
+            break
+    for frame in reversed(stack):
+        filename = frame.filename
+        if filename.startswith(root) and 'site-packages' not in filename and filename not in _MIDDLEWARE_FILES:
+            return f'{Path(filename).relative_to(root)}:{frame.lineno} in {frame.name}'
+    return None
+
+
+class QueryCapture:
+    """Database execute wrapper recording each statement's SQL, time and origin."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'sql': sql,
+                'params': params,
+                'ms': (time.perf_counter() - start) * 1000,
+                'alias': context['connection'].alias,
+                'origin': _origin(),
+            })
+
+    def analyze(self, slow_ms, duplicate_threshold):
+        """Return ``(duplicates, slow)`` findings for the captured queries."""
+        groups = defaultdict(list)
+        for query in self.queries:
+            if not _TRANSACTION.match(query['sql']):
+                groups[fingerprint(query['sql'])].append(query)
+
+        duplicates = []
+        for key, queries in groups.items():
+            if len(queries) < duplicate_threshold:
+                continue
+            origins = Counter(query['origin'] for query in queries if query['origin'])
+            duplicates.append({
+                'fingerprint': key,
+                'count': len(queries),
+                'ms': round(sum(query['ms'] for query in queries), 3),
+                'origins': [origin for origin, _ in origins.most_common(3)],
+            })
+        duplicates.sort(key=lambda item: -item['count'])
+
+        slow = [
+            {'fingerprint': fingerprint(query['sql']), 'ms': round(query['ms'], 3), 'origin': query['origin']}
+            for query in self.queries
+            if query['ms'] >= slow_ms
+        ]
+        return duplicates, slow
+
+
+class QueryInspectorMiddleware:
+    """
+    Capture and analyze the SQL of every request.
+
+    Runs sync or async, whichever the handler is; queries are captured in
+    whichever thread runs them (see query_hooks.py).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUERY_INSPECTOR_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow_ms = getattr(settings, 'QUERY_INSPECTOR_SLOW_MS', 100)
+        self.duplicate_threshold = getattr(settings, 'QUERY_INSPECTOR_DUPLICATE_THRESHOLD', 2)
+        self.log_path = getattr(settings, 'QUERY_INSPECTOR_LOG', None)
+        self.lock = threading.Lock()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        capture = QueryCapture()
+        with query_hooks.wrap_queries(capture):
+            response = self.get_response(request)
+        return self.report(request, response, capture)
+
+    async def __acall__(self, request):
+        capture = QueryCapture()
+        with query_hooks.wrap_queries(capture):
+            response = await self.get_response(request)
+        return self.report(request, response, capture)
+
+    def report(self, request, response, capture):
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unresolved'
+        duplicates, slow = capture.analyze(self.slow_ms, self.duplicate_threshold)
+        for item in duplicates:
+            logger.warning(
+                '%s: query ran %d times (%s): %s', view, item['count'], ', '.join(item['origins']) or '?',
+                item['fingerprint'],
+            )
+        for item in slow:
+            logger.warning('%s: slow query %.1fms (%s): %s', view, item['ms'], item['origin'] or '?',
+                           item['fingerprint'])
+
+        if self.log_path:
+            entry = {
+                'view': view,
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'queries': len(capture.queries),
+                'db_ms': round(sum(query['ms'] for query in capture.queries), 3),
+                'duplicates': duplicates,
+                'slow': slow,
+            }
+            with self.lock, open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry) + '\n')
+        return response
+
+
+def build_report(entries):
+    """
+    Aggregate logged requests per view.
+
+    Returns ``{view: {...}}`` with request and query totals, plus the
+    duplicate and slow fingerprints seen, each with the number of requests
+    that showed them.
+    """
+    report = {}
+    for entry in entries:
+        view = report.setdefault(entry['view'], {
+            'requests': 0,
+            'queries': 0,
+            'max_queries': 0,
+            'db_ms': 0.0,
+            'duplicates': {},
+            'slow': {},
+        })
+        view['requests'] += 1
+        view['queries'] += entry['queries']
+        view['max_queries'] = max(view['max_queries'], entry['queries'])
+        view['db_ms'] += entry['db_ms']
+        for item in entry['duplicates']:
+            found = view['duplicates'].setdefault(
+                item['fingerprint'], {'requests': 0, 'max_count': 0, 'origins': set()}
+            )
+            found['requests'] += 1
+            found['max_count'] = max(found['max_count'], item['count'])
+            found['origins'].update(item['origins'])
+        for item in entry['slow']:
+            found = view['slow'].setdefault(item['fingerprint'], {'requests': 0, 'max_ms': 0.0, 'origins': set()})
+            found['requests'] += 1
+            found['max_ms'] = max(found['max_ms'], item['ms'])
+            if item['origin']:
+                found['origins'].add(item['origin'])
+    return report
+
+
+# Plan lines that mean a full table scan, or a sort no index provides
+_PLAN_WARNINGS = {
+    'sqlite': (
+        ('full scan', re.compile(r'^SCAN (?!.*\bUSING\b)(?!CONSTANT ROW)(?!\()')),
+        ('sort', re.compile(r'USE TEMP B-TREE FOR (?:RIGHT PART OF )?ORDER BY')),
+    ),
+    'postgresql': (
+        ('full scan', re.compile(r'Seq Scan')),
+        ('sort', re.compile(r'(?:^|->\s*)Sort\b')),
+    ),
+}
+_EXPLAINABLE = re.compile(r'^\s*(SELECT|UPDATE|DELETE)\b', re.IGNORECASE)
+_LIMITED = re.compile(r'\bORDER BY\b.*\bLIMIT \d+(?: OFFSET \d+)?\s*$', re.IGNORECASE | re.DOTALL)
+
+
+def explain(sql, params, using='default'):
+    """The query plan of a statement, one line per plan node."""
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+        return [str(row[-1]) for row in cursor.fetchall()]
+
+
+def explain_queries(queries, using='default'):
+    """
+    EXPLAIN each distinct query shape among ``queries`` (as captured by
+    QueryCapture) and flag plans that scan a whole table or sort without an
+    index. Returns ``[{'fingerprint', 'plan', 'warnings', 'count', 'ms'}]``
+    ordered by total time; warnings are only detected on SQLite and
+    PostgreSQL.
+    """
+    vendor = connections[using].vendor
+    groups = {}
+    for query in queries:
+        if query['alias'] != using or not _EXPLAINABLE.match(query['sql']):
+            continue
+        key = fingerprint(query['sql'])
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = {'fingerprint': key, 'sql': query['sql'], 'params': query['params'], 'count': 0,
+                                   'ms': 0.0}
+        group['count'] += 1
+        group['ms'] += query['ms']
+
+    results = []
+    for group in groups.values():
+        plan = explain(group['sql'], group['params'], using)
+        warnings = [
+            (label, f'{label}: {line.strip()}')
+            for line in plan
+            for label, pattern in _PLAN_WARNINGS.get(vendor, ())
+            if pattern.search(line.strip())
+        ]
+        if _LIMITED.search(group['sql']) and not any(label == 'sort' for label, _ in warnings):
+            # Rows are read in index (or rowid) order and the scan stops at the LIMIT
+            warnings = [warning for warning in warnings if warning[0] != 'full scan']
+        results.append({
+            'fingerprint': group['fingerprint'],
+            'plan': plan,
+            'warnings': [message for _, message in warnings],
+            'count': group['count'],
+            'ms': round(group['ms'], 3),
+        })
+    results.sort(key=lambda item: -item['ms'])
+    return results
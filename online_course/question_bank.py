@@ -0,0 +1,399 @@
+"""
+Bulk import of question banks from JSON, CSV or YAML.
+
+A bank is a list of questions, each identified by a stable ``key``:
+
+    {"key": "py-101-q1", "lesson": 12, "question": "What is Python?",
+     "type": "MC", "points": 5, "order": 1,
+     "choices": [{"text": "A language", "correct": true}, {"text": "A snake"}]}
+
+Instead of a lesson id a record may name ``course`` (id) and ``lesson_title``;
+missing lessons are then created. CSV files have one row per choice with the
+columns key, lesson, course, lesson_title, question, type, points, order,
+choice, correct and choice_order; rows sharing a key form one question.
+
+Everything is validated before anything is written. Questions are then
+upserted by key and their choices by order with bulk_create, so existing
+answers keep pointing at the same Choice rows.
+"""
+import csv
+import io
+import json
+from collections import defaultdict
+
+from django.db import transaction
+
+from .fragments import invalidate_course_details
+from .grading import invalidate_answer_key
+from .models import Choice, Course, Lesson, Question
+
+FORMATS = ('json', 'csv', 'yaml')
+QUESTION_TYPES = {code for code, _ in Question.QUESTION_TYPE_CHOICES}
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'x'}
+
+
+class QuestionBankError(Exception):
+    """Raised when a question bank cannot be parsed or fails validation."""
+
+    def __init__(self, errors):
+        self.errors = errors if isinstance(errors, list) else [errors]
+        super().__init__('; '.join(self.errors[:5]))
+
+
+def _parse_rows(rows):
+    questions = {}
+    for row in rows:
+        key = (row.get('key') or '').strip()
+        record = questions.setdefault(key, {
+            'key': key,
+            'lesson': row.get('lesson'),
+            'course': row.get('course'),
+            'lesson_title': row.get('lesson_title'),
+            'question': row.get('question'),
+            'type': row.get('type'),
+            'points': row.get('points'),
+            'order': row.get('order'),
+            'choices': [],
+        })
+        if row.get('choice'):
+            record['choices'].append({
+                'text': row['choice'],
+                'correct': (row.get('correct') or '').strip().lower() in TRUE_VALUES,
+                'order': row.get('choice_order'),
+            })
+    return list(questions.values())
+
+
+def parse_question_bank(data, fmt):
+    """Parse raw bank contents (str or bytes) into a list of question records."""
+    if fmt not in FORMATS:
+        raise QuestionBankError(f'Unknown format: {fmt!r}')
+    if isinstance(data, bytes):
+        try:
+            data = data.decode('utf-8-sig')
+        except UnicodeDecodeError as e:
+            raise QuestionBankError(f'Could not decode {fmt}: files must be UTF-8 ({e})')
+    if fmt == 'csv':
+        try:
+            return _parse_rows(csv.DictReader(io.StringIO(data)))
+        except csv.Error as e:
+            raise QuestionBankError(f'Could not parse csv: {e}')
+    if fmt == 'yaml':
+        try:
+            import yaml
+        except ImportError:
+            raise QuestionBankError('YAML imports require PyYAML (pip install pyyaml)')
+        try:
+            records = yaml.safe_load(data)
+        except yaml.YAMLError as e:
+            raise QuestionBankError(f'Could not parse yaml: {e}')
+    else:
+        try:
+            records = json.loads(data)
+        except ValueError as e:
+            raise QuestionBankError(f'Could not parse json: {e}')
+
+    if isinstance(records, dict):
+        records = records.get('questions')
+    if not isinstance(records, list):
+        raise QuestionBankError('Expected a list of questions or {"questions": [...]}')
+    return records
+
+
+def _int(value, default=None):
+    if value in (None, ''):
+        return default
+    return int(value)
+
+
+def validate_question_bank(records):
+    """
+    Validate and normalize records, raising QuestionBankError with every problem.
+
+    Returns normalized records with integer fields, defaulted orders and a
+    ``lesson_ref`` that is either a lesson id or a ``(course_id, title)`` pair.
+    """
+    errors = []
+    normalized = []
+    seen_keys = set()
+
+    for index, record in enumerate(records, start=1):
+        label = f'record {index}'
+        if not isinstance(record, dict):
+            errors.append(f'{label}: expected an object')
+            continue
+        key = str(record.get('key') or '').strip()
+        if key:
+            label = f'record {index} ({key})'
+        problems = []
+
+        if not key:
+            problems.append('missing key')
+        elif len(key) > 100:
+            problems.append('key longer than 100 characters')
+        elif key in seen_keys:
+            problems.append('duplicate key')
+        seen_keys.add(key)
+
+        try:
+            lesson_id = _int(record.get('lesson'))
+            course_id = _int(record.get('course'))
+            points = _int(record.get('points'), 1)
+            order = _int(record.get('order'))
+        except (TypeError, ValueError):
+            errors.append(f'{label}: lesson, course, points and order must be integers')
+            continue
+
+        title = str(record.get('lesson_title') or '').strip()
+        if lesson_id is not None:
+            lesson_ref = lesson_id
+        elif course_id is not None and title:
+            lesson_ref = (course_id, title)
+        else:
+            lesson_ref = None
+            problems.append('needs a lesson id, or a course id and lesson_title')
+
+        text = str(record.get('question') or '').strip()
+        if not text:
+            problems.append('missing question text')
+        question_type = str(record.get('type') or 'MC').strip().upper()
+        if question_type not in QUESTION_TYPES:
+            problems.append(f'unknown type {question_type!r}')
+        if points < 1:
+            problems.append('points must be at least 1')
+
+        choices = []
+        raw_choices = record.get('choices') or []
+        if not isinstance(raw_choices, list):
+            problems.append('choices must be a list')
+            raw_choices = []
+        for position, choice in enumerate(raw_choices, start=1):
+            if not isinstance(choice, dict) or not str(choice.get('text') or '').strip():
+                problems.append(f'choice {position} has no text')
+                continue
+            try:
+                choice_order = _int(choice.get('order'), position)
+            except (TypeError, ValueError):
+                problems.append(f'choice {position} order must be an integer')
+                continue
+            correct = choice.get('correct', False)
+            if isinstance(correct, str):
+                correct = correct.strip().lower() in TRUE_VALUES
+            choices.append({'text': str(choice['text']).strip(), 'correct': bool(correct), 'order': choice_order})
+
+        choice_orders = [choice['order'] for choice in choices]
+        if len(choice_orders) != len(set(choice_orders)):
+            problems.append('choice orders are not unique')
+        if question_type in ('MC', 'TF'):
+            correct_count = sum(choice['correct'] for choice in choices)
+            if correct_count != 1:
+                problems.append(f'{question_type} questions need exactly one correct choice, found {correct_count}')
+        if question_type == 'TF' and len(choices) != 2:
+            problems.append('TF questions need exactly two choices')
+
+        if problems:
+            errors.extend(f'{label}: {problem}' for problem in problems)
+            continue
+        normalized.append({
+            'key': key,
+            'lesson_ref': lesson_ref,
+            'question': text,
+            'type': question_type,
+            'points': points,
+            'order': order,
+            'choices': choices,
+        })
+
+    _default_orders(normalized)
+    errors.extend(_check_references(normalized))
+    if errors:
+        raise QuestionBankError(errors)
+    return normalized
+
+
+def _default_orders(records):
+    """
+    Number questions without an order after the last one in their lesson,
+    counting the lesson's questions this bank leaves untouched and the
+    questions before them in the file.
+    """
+    refs = {r['lesson_ref'] for r in records}
+    lesson_ids = {ref: ref for ref in refs if isinstance(ref, int)}
+    lesson_ids.update(_named_lessons({ref for ref in refs if isinstance(ref, tuple)}))
+    keys = {r['key'] for r in records}
+    highest = {}
+    existing = Question.objects.filter(lesson_id__in=set(lesson_ids.values())).values_list(
+        'lesson_id', 'order', 'external_key'
+    )
+    for lesson_id, order, key in existing.iterator():
+        if key not in keys:
+            highest[lesson_id] = max(highest.get(lesson_id, order), order)
+
+    next_order = {ref: highest.get(lesson_id, 0) for ref, lesson_id in lesson_ids.items()}
+    for record in records:
+        ref = record['lesson_ref']
+        if record['order'] is None:
+            record['order'] = next_order.get(ref, 0) + 1
+        next_order[ref] = max(next_order.get(ref, 0), record['order'])
+
+
+def _check_references(records):
+    """Check lesson/course ids exist and question orders are unique per lesson."""
+    errors = []
+    lesson_ids = {r['lesson_ref'] for r in records if isinstance(r['lesson_ref'], int)}
+    course_ids = {r['lesson_ref'][0] for r in records if isinstance(r['lesson_ref'], tuple)}
+    known_lessons = set(Lesson.objects.filter(id__in=lesson_ids).values_list('id', flat=True))
+    known_courses = set(Course.objects.filter(id__in=course_ids).values_list('id', flat=True))
+    for missing in sorted(lesson_ids - known_lessons):
+        errors.append(f'lesson {missing} does not exist')
+    for missing in sorted(course_ids - known_courses):
+        errors.append(f'course {missing} does not exist')
+
+    # Orders must not collide within the file or with questions left untouched
+    keys = {r['key'] for r in records}
+    taken = defaultdict(dict)
+    existing = Question.objects.filter(lesson_id__in=known_lessons).values_list('lesson_id', 'order', 'external_key')
+    for lesson_id, order, key in existing.iterator():
+        if key not in keys:
+            taken[lesson_id][order] = key or 'an existing question'
+    for record in records:
+        ref, order = record['lesson_ref'], record['order']
+        holder = taken[ref].get(order)
+        if holder is not None:
+            errors.append(f'{record["key"]}: order {order} already used by {holder} in lesson {ref}')
+        taken[ref][order] = record['key']
+    return errors
+
+
+def _named_lessons(named):
+    """Map the ``(course_id, title)`` refs that name existing lessons to the first such lesson's id."""
+    lessons = {}
+    if named:
+        course_ids = {course_id for course_id, _ in named}
+        for lesson_id, course_id, title in Lesson.objects.filter(course_id__in=course_ids).order_by('id').values_list(
+            'id', 'course_id', 'title'
+        ):
+            if (course_id, title) in named:
+                lessons.setdefault((course_id, title), lesson_id)
+    return lessons
+
+
+def _resolve_lessons(records):
+    """Map every lesson_ref to a lesson id, creating lessons named by title."""
+    resolved = {r['lesson_ref']: r['lesson_ref'] for r in records if isinstance(r['lesson_ref'], int)}
+    named = {r['lesson_ref'] for r in records if isinstance(r['lesson_ref'], tuple)}
+    if named:
+        resolved.update(_named_lessons(named))
+        missing = [ref for ref in named if ref not in resolved]
+        created = Lesson.objects.bulk_create([
+            Lesson(course_id=course_id, title=title, description='', content='')
+            for course_id, title in missing
+        ])
+        for ref, lesson in zip(missing, created):
+            resolved[ref] = lesson.id
+    return resolved
+
+
+def import_question_bank(records, batch_size=1000):
+    """
+    Validate and upsert a question bank. Returns counts of what changed.
+
+    The whole import runs in one transaction; rows are written with plain
+    and upserting bulk_create calls in batches of ``batch_size``, and rows
+    whose values did not change are not written at all.
+    """
+    records = validate_question_bank(records)
+    counts = dict.fromkeys(
+        ('questions_created', 'questions_updated', 'choices_created', 'choices_updated', 'choices_deleted'), 0
+    )
+
+    with transaction.atomic():
+        lessons = _resolve_lessons(records)
+        existing = {}
+        keys = [r['key'] for r in records]
+        for offset in range(0, len(keys), batch_size):
+            existing.update(Question.objects.in_bulk(keys[offset:offset + batch_size], field_name='external_key'))
+
+        # Lessons that updated questions move away from need invalidating too
+        touched = set(lessons.values()) | {q.lesson_id for q in existing.values()}
+
+        # Unchanged questions are left alone; changed ones are upserted on
+        # external_key, which is much cheaper than bulk_update's CASE WHEN
+        to_create, to_update, unchanged = [], [], []
+        for record in records:
+            question = existing.get(record['key']) or Question(external_key=record['key'])
+            values = {
+                'lesson_id': lessons[record['lesson_ref']],
+                'question_text': record['question'],
+                'question_type': record['type'],
+                'points': record['points'],
+                'order': record['order'],
+            }
+            if question.pk and all(getattr(question, field) == value for field, value in values.items()):
+                unchanged.append(question)
+                continue
+            for field, value in values.items():
+                setattr(question, field, value)
+            (to_update if question.pk else to_create).append(question)
+
+        Question.objects.bulk_create(to_create, batch_size=batch_size)
+        Question.objects.bulk_create(
+            to_update,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=['external_key'],
+            update_fields=['lesson', 'question_text', 'question_type', 'points', 'order', 'updated_at'],
+        )
+        counts['questions_created'] = len(to_create)
+        counts['questions_updated'] = len(to_update)
+
+        questions = {q.external_key: q for q in to_create + to_update + unchanged}
+        current = defaultdict(dict)
+        updated_ids = [q.pk for q in to_update + unchanged]
+        for offset in range(0, len(updated_ids), batch_size):
+            for choice in Choice.objects.filter(question_id__in=updated_ids[offset:offset + batch_size]).only(
+                'id', 'question_id', 'order', 'choice_text', 'is_correct'
+            ):
+                current[choice.question_id][choice.order] = choice
+
+        new_choices, changed_choices, stale_ids = [], [], []
+        for record in records:
+            question = questions[record['key']]
+            existing_choices = current.pop(question.pk, {})
+            for spec in record['choices']:
+                choice = existing_choices.pop(spec['order'], None)
+                if choice is None:
+                    new_choices.append(Choice(
+                        question=question, choice_text=spec['text'], is_correct=spec['correct'], order=spec['order']
+                    ))
+                elif choice.choice_text != spec['text'] or choice.is_correct != spec['correct']:
+                    choice.choice_text = spec['text']
+                    choice.is_correct = spec['correct']
+                    changed_choices.append(choice)
+            stale_ids.extend(choice.pk for choice in existing_choices.values())
+
+        Choice.objects.bulk_create(new_choices, batch_size=batch_size)
+        Choice.objects.bulk_create(
+            changed_choices,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=['id'],
+            update_fields=['choice_text', 'is_correct', 'updated_at'],
+        )
+        for offset in range(0, len(stale_ids), batch_size):
+            Choice.objects.filter(pk__in=stale_ids[offset:offset + batch_size]).delete()
+        counts['choices_created'] = len(new_choices)
+        counts['choices_updated'] = len(changed_choices)
+        counts['choices_deleted'] = len(stale_ids)
+
+        # Bulk writes skip model signals, so invalidate caches explicitly
+        course_ids = dict(Lesson.objects.filter(id__in=touched).values_list('id', 'course_id'))
+        transaction.on_commit(lambda: _invalidate(course_ids))
+
+    return counts
+
+
+def _invalidate(course_ids):
+    for lesson_id, course_id in course_ids.items():
+        invalidate_answer_key(lesson_id)
+        invalidate_course_details(course_id=course_id, lesson_id=lesson_id)
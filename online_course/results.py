@@ -0,0 +1,131 @@
+"""
+Result snapshots rendered by show_exam_result.
+
+A graded submission never changes, so the question text, choices, selection
+and points of every answer are serialized once, at grading time, into
+``Submission.result_snapshot``. The result page then loads the submission row
+and renders from that blob instead of joining answers, questions and choices.
+
+The snapshot is a copy of the exam as it was graded. When an instructor later
+rewords a question or changes which choice is correct, the result still shows
+what the student answered and why it scored the points it did.
+
+Snapshots are built from an exam sheet: the texts and choices of a lesson's
+questions, cached under the answer key's version so question and choice
+edits invalidate both (see grading.py). Submissions graded before snapshots
+existed get theirs built from their answers the first time they are viewed.
+"""
+from django.conf import settings
+
+from .caching import get_cache, get_version
+from .models import Question, Submission, SubmissionAnswer
+
+
+def load_exam_sheet(lesson_id):
+    """
+    Load the questions of a lesson with their choices in a single query.
+
+    Returns ``{question_id: (question_text, points, choices)}`` in question
+    order, where ``choices`` is a list of ``[choice_id, choice_text, is_correct]``.
+    """
+    rows = Question.objects.filter(lesson_id=lesson_id).order_by(
+        'order', 'id', 'choices__order', 'choices__id'
+    ).values_list('id', 'question_text', 'points', 'choices__id', 'choices__choice_text', 'choices__is_correct')
+
+    sheet = {}
+    for question_id, text, points, choice_id, choice_text, is_correct in rows:
+        _, _, choices = sheet.setdefault(question_id, (text, points, []))
+        if choice_id is not None:
+            choices.append([choice_id, choice_text, is_correct])
+    return sheet
+
+
+def get_exam_sheet(lesson_id):
+    """Return the exam sheet of a lesson, cached alongside its answer key."""
+    cache = get_cache('ANSWER_KEY_CACHE_ALIAS')
+    key = f'exam_sheet:{lesson_id}:{get_version(cache, f"answer_key:{lesson_id}")}'
+    sheet = cache.get(key)
+    if sheet is None:
+        sheet = load_exam_sheet(lesson_id)
+        cache.set(key, sheet, timeout=getattr(settings, 'ANSWER_KEY_CACHE_TIMEOUT', 300))
+    return sheet
+
+
+def build_snapshot(sheet, answers):
+    """
+    Snapshot the answers of a graded submission.
+
+    ``answers`` are the dicts in ``score_responses()['answers']``. Questions
+    appear in sheet order; only answered ones are included, as only those
+    have SubmissionAnswer rows.
+    """
+    by_question = {answer['question_id']: answer for answer in answers}
+    questions = []
+    points_possible = points_earned = 0
+    for question_id, (text, points, choices) in sheet.items():
+        answer = by_question.get(question_id)
+        if answer is None:
+            continue
+        questions.append({
+            'text': text,
+            'points': points,
+            'choices': choices,
+            'selected': answer['choice_id'],
+            'correct': answer['is_correct'],
+            'earned': answer['points_earned'],
+        })
+        points_possible += points
+        points_earned += answer['points_earned']
+    return {'questions': questions, 'points_possible': points_possible, 'points_earned': points_earned}
+
+
+def snapshot_from_answers(submission):
+    """Build the snapshot of a submission graded before snapshots were stored."""
+    answers = SubmissionAnswer.objects.filter(submission=submission).select_related(
+        'question'
+    ).prefetch_related('question__choices').order_by('question__order', 'question_id')
+
+    questions = []
+    for answer in answers:
+        questions.append({
+            'text': answer.question.question_text,
+            'points': answer.question.points,
+            'choices': [
+                [choice.id, choice.choice_text, choice.is_correct] for choice in answer.question.choices.all()
+            ],
+            'selected': answer.selected_choice_id,
+            'correct': answer.is_correct,
+            'earned': answer.points_earned,
+        })
+    return {
+        'questions': questions,
+        'points_possible': sum(question['points'] for question in questions),
+        'points_earned': sum(question['earned'] for question in questions),
+    }
+
+
+def get_snapshot(submission):
+    """Return the result snapshot of a GRADED submission, storing it if missing."""
+    if submission.result_snapshot is None:
+        submission.result_snapshot = snapshot_from_answers(submission)
+        Submission.objects.filter(pk=submission.pk).update(result_snapshot=submission.result_snapshot)
+    return submission.result_snapshot
+
+
+def detailed_results(snapshot):
+    """Expand a snapshot into the per-question rows exam_result.html renders."""
+    results = []
+    for question in snapshot['questions']:
+        choices = [
+            {'id': choice_id, 'choice_text': text, 'is_correct': is_correct}
+            for choice_id, text, is_correct in question['choices']
+        ]
+        results.append({
+            'question_text': question['text'],
+            'selected_choice': next((choice for choice in choices if choice['id'] == question['selected']), None),
+            'is_correct': question['correct'],
+            'points_earned': question['earned'],
+            'total_points': question['points'],
+            'all_choices': choices,
+        })
+    return results
@@ -0,0 +1,106 @@
+"""
+Primary/replica database routing.
+
+Reads go to the ``replica`` database only when ReplicaRoutingMiddleware
+has opted the current request in: a GET or HEAD to one of the views in
+``REPLICA_READ_VIEWS``, from a client that has not written recently.
+Everything else uses ``default``, the primary. That includes management
+commands, the grading worker and reads inside a transaction.
+
+Read-your-writes: a request with an unsafe method (POST, ...) sets a short-lived
+cookie, and requests carrying it read from the primary for
+``REPLICA_STICKY_SECONDS``. That is long enough for the replica to catch up,
+so after submitting an exam the redirect to the result page sees the new
+submission. A write made during a replica-routed request also moves the
+rest of that request to the primary.
+"""
+from contextvars import ContextVar
+from fnmatch import fnmatchcase
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+REPLICA = 'replica'
+STICKY_COOKIE = 'read_primary'
+
+# Whether reads in the current request may use the replica
+use_replica = ContextVar('use_replica', default=False)
+
+
+def replica_available():
+    return REPLICA in connections.settings
+
+
+class PrimaryReplicaRouter:
+    """Send opted-in reads to the replica and everything else to the primary."""
+
+    def db_for_read(self, model, **hints):
+        if use_replica.get() and not connections['default'].in_atomic_block:
+            return REPLICA
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        # Read the rest of the request from where it just wrote
+        use_replica.set(False)
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica is migrated by replication, never directly
+        return db != REPLICA
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Decide per request whether its reads may be served by the replica.
+
+    Runs sync or async, whichever the handler is, so under ASGI it does not
+    move requests for the async views off the event loop.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.read_views = getattr(settings, 'REPLICA_READ_VIEWS', [])
+        self.sticky_seconds = getattr(settings, 'REPLICA_STICKY_SECONDS', 10)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = use_replica.set(False)
+        try:
+            response = self.get_response(request)
+        finally:
+            use_replica.reset(token)
+        return self.set_sticky_cookie(request, response)
+
+    async def __acall__(self, request):
+        token = use_replica.set(False)
+        try:
+            response = await self.get_response(request)
+        finally:
+            use_replica.reset(token)
+        return self.set_sticky_cookie(request, response)
+
+    def set_sticky_cookie(self, request, response):
+        if request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE') and replica_available():
+            response.set_cookie(
+                STICKY_COOKIE, '1', max_age=self.sticky_seconds, httponly=True, samesite='Lax',
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (
+            request.method in ('GET', 'HEAD')
+            and replica_available()
+            and STICKY_COOKIE not in request.COOKIES
+            and any(fnmatchcase(request.resolver_match.view_name, pattern) for pattern in self.read_views)
+        ):
+            use_replica.set(True)
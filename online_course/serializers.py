@@ -0,0 +1,79 @@
+"""
+Serializers for the read-only JSON API.
+
+They only read the fields they output; the matching viewsets in ``api.py``
+restrict querysets with ``only()`` and prefetch nested rows up front, so no
+serializer triggers a query of its own. Choice correctness is never exposed
+for lessons.
+"""
+from rest_framework import serializers
+
+from .models import Choice, Course, Lesson, Question, Submission, SubmissionAnswer
+
+
+class CourseSerializer(serializers.ModelSerializer):
+    lesson_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Course
+        fields = ['id', 'name', 'description', 'lesson_count', 'created_at', 'updated_at']
+
+
+class LessonSummarySerializer(serializers.ModelSerializer):
+    question_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Lesson
+        fields = ['id', 'course', 'title', 'description', 'order', 'question_count', 'updated_at']
+
+
+class CourseDetailSerializer(CourseSerializer):
+    lessons = LessonSummarySerializer(many=True, read_only=True)
+
+    class Meta(CourseSerializer.Meta):
+        fields = CourseSerializer.Meta.fields + ['lessons']
+
+
+class ChoiceSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Choice
+        fields = ['id', 'choice_text', 'order']
+
+
+class QuestionSerializer(serializers.ModelSerializer):
+    choices = ChoiceSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Question
+        fields = ['id', 'question_text', 'question_type', 'points', 'order', 'choices']
+
+
+class LessonDetailSerializer(LessonSummarySerializer):
+    questions = QuestionSerializer(many=True, read_only=True)
+
+    class Meta(LessonSummarySerializer.Meta):
+        fields = LessonSummarySerializer.Meta.fields + ['content', 'questions']
+
+
+class SubmissionAnswerSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SubmissionAnswer
+        fields = ['question', 'selected_choice', 'is_correct', 'points_earned']
+
+
+class SubmissionSerializer(serializers.ModelSerializer):
+    course = serializers.IntegerField(source='lesson.course_id', read_only=True)
+
+    class Meta:
+        model = Submission
+        fields = [
+            'id', 'lesson', 'course', 'attempt', 'status', 'score', 'total_questions', 'correct_answers',
+            'submitted_at', 'graded_at', 'updated_at',
+        ]
+
+
+class SubmissionDetailSerializer(SubmissionSerializer):
+    answers = SubmissionAnswerSerializer(many=True, read_only=True)
+
+    class Meta(SubmissionSerializer.Meta):
+        fields = SubmissionSerializer.Meta.fields + ['answers']
@@ -0,0 +1,90 @@
+"""
+Signal handlers keeping cached exam data in sync with model changes.
+"""
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .fragments import invalidate_course_details
+from .grading import invalidate_answer_key, submission_graded, submissions_graded
+from .models import Choice, Lesson, Question
+from .progress import record_progress, record_progress_batch
+from .stats import record_graded_submission, record_graded_submissions
+
+
+@receiver(pre_save, sender=Lesson)
+def remember_previous_course(sender, instance, raw=False, **kwargs):
+    """Record the course a lesson belonged to before it is moved."""
+    if raw or instance.pk is None:
+        instance._previous_course_id = None
+        return
+    instance._previous_course_id = (
+        Lesson.objects.filter(pk=instance.pk).values_list('course_id', flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def invalidate_lesson_caches(sender, instance, **kwargs):
+    invalidate_course_details(course_id=instance.course_id)
+    previous_course_id = getattr(instance, '_previous_course_id', None)
+    if previous_course_id not in (None, instance.course_id):
+        invalidate_course_details(course_id=previous_course_id)
+
+
+@receiver(pre_save, sender=Question)
+def remember_previous_lesson(sender, instance, raw=False, **kwargs):
+    """Record the lesson a question belonged to before it is moved."""
+    if raw or instance.pk is None:
+        instance._previous_lesson = None
+        return
+    instance._previous_lesson = (
+        Question.objects.filter(pk=instance.pk).values_list('lesson_id', 'lesson__course_id').first()
+    )
+
+
+def _invalidate_lesson(lesson_id, course_id):
+    invalidate_answer_key(lesson_id)
+    invalidate_course_details(course_id=course_id, lesson_id=lesson_id)
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def invalidate_question_caches(sender, instance, **kwargs):
+    try:
+        course_id = instance.lesson.course_id
+    except Lesson.DoesNotExist:
+        course_id = None
+    _invalidate_lesson(instance.lesson_id, course_id)
+    previous = getattr(instance, '_previous_lesson', None)
+    if previous and previous[0] != instance.lesson_id:
+        _invalidate_lesson(*previous)
+
+
+@receiver(post_save, sender=Choice)
+@receiver(post_delete, sender=Choice)
+def invalidate_choice_caches(sender, instance, **kwargs):
+    try:
+        lesson = instance.question.lesson
+    except (Question.DoesNotExist, Lesson.DoesNotExist):
+        return
+    _invalidate_lesson(lesson.id, lesson.course_id)
+
+
+@receiver(submission_graded)
+def update_stats(sender, submission, **kwargs):
+    record_graded_submission(submission)
+
+
+@receiver(submissions_graded)
+def update_stats_in_bulk(sender, submissions, **kwargs):
+    record_graded_submissions(submissions)
+
+
+@receiver(submission_graded)
+def update_progress(sender, submission, **kwargs):
+    record_progress(submission)
+
+
+@receiver(submissions_graded)
+def update_progress_in_bulk(sender, submissions, **kwargs):
+    record_progress_batch(submissions)
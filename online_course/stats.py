@@ -0,0 +1,153 @@
+"""
+Denormalized exam statistics per lesson and per course.
+
+LessonStats/CourseStats hold running totals that are incremented with F()
+expressions whenever a submission is graded, so dashboards read a single
+row instead of aggregating over every submission. rebuild_stats() recomputes
+them from scratch in chunks, e.g. after bulk imports that bypass grading.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Q, Sum
+
+from .grading import PASSING_SCORE
+from .models import Course, CourseStats, Lesson, LessonStats, Submission
+
+STAT_FIELDS = ['attempts', 'passed', 'score_total', 'last_graded_at']
+
+
+def _increment(model, lookup, attempts, passed, score_total, last_graded_at):
+    changes = {
+        'attempts': F('attempts') + attempts,
+        'passed': F('passed') + passed,
+        'score_total': F('score_total') + score_total,
+        'last_graded_at': last_graded_at,
+    }
+    if model.objects.filter(**lookup).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(
+                attempts=attempts,
+                passed=passed,
+                score_total=score_total,
+                last_graded_at=last_graded_at,
+                **lookup,
+            )
+    except IntegrityError:
+        # Another transaction created the row first; increment it instead
+        model.objects.filter(**lookup).update(**changes)
+
+
+def record_graded_submission(submission):
+    """Add a newly graded submission to its lesson and course totals."""
+    totals = (1, 1 if submission.score >= PASSING_SCORE else 0, submission.score, submission.graded_at)
+    _increment(LessonStats, {'lesson_id': submission.lesson_id}, *totals)
+    _increment(CourseStats, {'course_id': submission.lesson.course_id}, *totals)
+
+
+def record_graded_submissions(submissions):
+    """
+    Add a batch of newly graded submissions to the totals, with one
+    increment per lesson and per course instead of one per submission.
+    """
+    lessons, courses = {}, {}
+    for submission in submissions:
+        for totals, key in ((lessons, submission.lesson_id), (courses, submission.lesson.course_id)):
+            attempts, passed, score_total, last_graded_at = totals.get(key, (0, 0, 0, None))
+            totals[key] = (
+                attempts + 1,
+                passed + (1 if submission.score >= PASSING_SCORE else 0),
+                score_total + submission.score,
+                max(last_graded_at, submission.graded_at) if last_graded_at else submission.graded_at,
+            )
+    for lesson_id, totals in lessons.items():
+        _increment(LessonStats, {'lesson_id': lesson_id}, *totals)
+    for course_id, totals in courses.items():
+        _increment(CourseStats, {'course_id': course_id}, *totals)
+
+
+def rebuild_lesson_stats(lesson_ids):
+    """Recompute LessonStats for the given lessons with one aggregate query."""
+    rows = (
+        Submission.objects.filter(lesson_id__in=lesson_ids, status='GRADED')
+        .order_by()
+        .values('lesson_id')
+        .annotate(
+            attempts=Count('id'),
+            passed=Count('id', filter=Q(score__gte=PASSING_SCORE)),
+            score_total=Sum('score'),
+            last_graded_at=Max('graded_at'),
+        )
+    )
+    totals = {row['lesson_id']: row for row in rows}
+    stats = [
+        LessonStats(
+            lesson_id=lesson_id,
+            attempts=totals.get(lesson_id, {}).get('attempts', 0),
+            passed=totals.get(lesson_id, {}).get('passed', 0),
+            score_total=totals.get(lesson_id, {}).get('score_total') or 0,
+            last_graded_at=totals.get(lesson_id, {}).get('last_graded_at'),
+        )
+        for lesson_id in lesson_ids
+    ]
+    LessonStats.objects.bulk_create(
+        stats, update_conflicts=True, unique_fields=['lesson'], update_fields=STAT_FIELDS
+    )
+
+
+def rebuild_course_stats(course_ids):
+    """Recompute CourseStats for the given courses from their LessonStats."""
+    rows = (
+        LessonStats.objects.filter(lesson__course_id__in=course_ids)
+        .order_by()
+        .values('lesson__course_id')
+        .annotate(
+            total_attempts=Sum('attempts'),
+            total_passed=Sum('passed'),
+            total_score=Sum('score_total'),
+            latest=Max('last_graded_at'),
+        )
+    )
+    totals = {row['lesson__course_id']: row for row in rows}
+    stats = [
+        CourseStats(
+            course_id=course_id,
+            attempts=totals.get(course_id, {}).get('total_attempts') or 0,
+            passed=totals.get(course_id, {}).get('total_passed') or 0,
+            score_total=totals.get(course_id, {}).get('total_score') or 0,
+            last_graded_at=totals.get(course_id, {}).get('latest'),
+        )
+        for course_id in course_ids
+    ]
+    CourseStats.objects.bulk_create(
+        stats, update_conflicts=True, unique_fields=['course'], update_fields=STAT_FIELDS
+    )
+
+
+def _chunks(queryset, chunk_size):
+    ids = list(queryset.order_by('id').values_list('id', flat=True))
+    for offset in range(0, len(ids), chunk_size):
+        yield ids[offset:offset + chunk_size]
+
+
+def rebuild_stats(chunk_size=500, log=None):
+    """
+    Rebuild every LessonStats and CourseStats row in chunked passes.
+
+    Lessons are aggregated ``chunk_size`` at a time, each chunk in its own
+    transaction; course totals are then summed from the lesson rows.
+    """
+    lessons = courses = 0
+    for lesson_ids in _chunks(Lesson.objects.all(), chunk_size):
+        with transaction.atomic():
+            rebuild_lesson_stats(lesson_ids)
+        lessons += len(lesson_ids)
+        if log:
+            log(f'lessons: {lessons:,}')
+    for course_ids in _chunks(Course.objects.all(), chunk_size):
+        with transaction.atomic():
+            rebuild_course_stats(course_ids)
+        courses += len(course_ids)
+        if log:
+            log(f'courses: {courses:,}')
+    return lessons, courses
@@ -1,14 +1,33 @@
-from django.urls import path
-from . import views
+from django.conf import settings
+from django.urls import include, path
+from . import async_views, views
+from .api import SubmissionIngestView, router
 
 app_name = 'online_course'
 
+# The async versions of the course and exam pages, when served under ASGI
+pages = async_views if getattr(settings, 'ASYNC_VIEWS', False) else views
+
 urlpatterns = [
     # Course URLs
-    path('courses/', views.course_list, name='course_list'),
-    path('courses/<int:course_id>/', views.course_details, name='course_details'),
+    path('courses/', pages.course_list, name='course_list'),
+    path('courses/<int:course_id>/', pages.course_details, name='course_details'),
+    path('lessons/<int:lesson_id>/fragment/', views.lesson_fragment, name='lesson_fragment'),
     
     # Exam URLs
-    path('lessons/<int:lesson_id>/submit/', views.submit, name='submit'),
-    path('submissions/<int:submission_id>/result/', views.show_exam_result, name='show_exam_result'),
+    path('lessons/<int:lesson_id>/submit/', pages.submit, name='submit'),
+    path('lessons/<int:lesson_id>/autosave/', views.autosave, name='autosave'),
+    path('submissions/<int:submission_id>/result/', pages.show_exam_result, name='show_exam_result'),
+    path('submissions/<int:submission_id>/status/', views.submission_status, name='submission_status'),
+    
+    # Export URLs
+    path('exports/submissions/', views.export_submissions, name='export_submissions'),
+    
+    # JSON API
+    path('api/submissions/ingest/', SubmissionIngestView.as_view(), name='api-submission-ingest'),
+    path('api/', include(router.urls)),
+    
+    # Monitoring URLs
+    path('cache/stats/', views.cache_stats, name='cache_stats'),
+    path('metrics', views.metrics, name='metrics'),
 ]
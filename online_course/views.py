@@ -1,9 +1,24 @@
+import json
+
 from django.shortcuts import render, redirect, get_object_or_404
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpResponse, JsonResponse, Http404, HttpResponseBadRequest, StreamingHttpResponse
+from django.urls import reverse
 from django.views.decorators.http import require_http_methods
 from django.utils import timezone
-from django.db import transaction
-from .models import Course, Lesson, Question, Choice, Submission, SubmissionAnswer
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.crypto import constant_time_compare
+from django.db import IntegrityError, transaction
+from .models import Course, Lesson, Question, Submission, SubmissionAnswer
+from .attempts import attempts_left, attempts_used, best_attempt, latest_attempt, max_attempts
+from .autosave import clean_answers, discard_buffer, save_answers, saved_answers
+from .grading import PASSING_SCORE, get_answer_key, parse_responses, grade_submission
+from .results import detailed_results, get_snapshot
+from .fragments import fragment_cache_stats, lesson_body_key, render_course_details, render_lesson_body
+from .exports import FORMATS, parse_boundary, stream_export
+from .metrics import REGISTRY
 
 
 @login_required(login_url='login')
@@ -14,92 +29,118 @@ def submit(request, lesson_id):
     GET: Display the exam questions
     POST: Process and submit exam answers
     """
-    lesson = get_object_or_404(Lesson, id=lesson_id)
+    lesson = get_object_or_404(Lesson.objects.select_related('course'), id=lesson_id)
+    latest = latest_attempt(request.user.id, lesson.id)
     
     if request.method == 'POST':
-        # Create or get existing submission
-        submission, created = Submission.objects.get_or_create(
-            student=request.user,
-            lesson=lesson,
-            defaults={'status': 'SUBMITTED'}
-        )
-        
-        if not created and submission.status != 'IN_PROGRESS':
-            return redirect('show_exam_result', submission_id=submission.id)
+        # Still being graded, or no attempts left: show the latest result
+        if latest is not None and (
+            latest.status == 'SUBMITTED'
+            or latest.status != 'IN_PROGRESS' and attempts_left(lesson, latest.attempt) == 0
+        ):
+            return redirect('online_course:show_exam_result', submission_id=latest.id)
         
-        with transaction.atomic():
-            # Clear previous answers if resubmitting
-            if not created:
-                SubmissionAnswer.objects.filter(submission=submission).delete()
-            
-            submission.status = 'SUBMITTED'
-            submission.submitted_at = timezone.now()
-            
-            # Get all questions for this lesson
-            questions = Question.objects.filter(lesson=lesson)
-            correct_count = 0
-            total_points = 0
-            earned_points = 0
-            
-            # Process each answer
-            for question in questions:
-                choice_id = request.POST.get(f'question_{question.id}')
+        try:
+            with transaction.atomic():
+                if latest is not None and latest.status == 'IN_PROGRESS':
+                    # Finish the draft attempt; drafts are not kept as history.
+                    # Claim it first, so a double click or a retry racing this
+                    # POST does not grade it again
+                    claimed = Submission.objects.filter(pk=latest.pk, status='IN_PROGRESS').update(
+                        status='SUBMITTED'
+                    )
+                    if not claimed:
+                        return redirect('online_course:show_exam_result', submission_id=latest.id)
+                    submission = latest
+                    SubmissionAnswer.objects.filter(submission=submission).delete()
+                else:
+                    # Retakes insert the next attempt; earlier ones stay as they are
+                    submission = Submission.objects.create(
+                        student=request.user,
+                        lesson=lesson,
+                        attempt=latest.attempt + 1 if latest is not None else 1,
+                        status='IN_PROGRESS',
+                    )
                 
-                if choice_id:
-                    try:
-                        selected_choice = Choice.objects.get(id=choice_id)
-                        is_correct = selected_choice.is_correct
-                        points_earned = question.points if is_correct else 0
-                        
-                        if is_correct:
-                            correct_count += 1
-                        
-                        SubmissionAnswer.objects.create(
-                            submission=submission,
-                            question=question,
-                            selected_choice=selected_choice,
-                            is_correct=is_correct,
-                            points_earned=points_earned
-                        )
-                        
-                        earned_points += points_earned
-                    except Choice.DoesNotExist:
-                        pass
+                submission.status = 'SUBMITTED'
+                submission.submitted_at = timezone.now()
                 
-                total_points += question.points
-            
-            # Calculate and save results
-            submission.total_questions = questions.count()
-            submission.correct_answers = correct_count
-            
-            # Calculate percentage score
-            if total_points > 0:
-                submission.score = int((earned_points / total_points) * 100)
-            else:
-                submission.score = 0
-            
-            submission.status = 'GRADED'
-            submission.graded_at = timezone.now()
-            submission.save()
+                if getattr(settings, 'ASYNC_GRADING', False):
+                    # Store the raw answers; the grade_worker command grades them
+                    submission.responses = parse_responses(request.POST)
+                    submission.save()
+                else:
+                    # Grade all answers in one pass against the lesson's answer key
+                    answer_key = get_answer_key(lesson.id)
+                    responses = parse_responses(request.POST, answer_key)
+                    grade_submission(submission, responses, answer_key=answer_key)
+        except IntegrityError:
+            # A concurrent POST (e.g. a double click) stored this attempt first
+            submission = latest_attempt(request.user.id, lesson.id)
+        discard_buffer(request.user.id, lesson.id)
         
-        return redirect('show_exam_result', submission_id=submission.id)
+        return redirect('online_course:show_exam_result', submission_id=submission.id)
     
     # GET request - display exam questions
-    questions = Question.objects.filter(lesson=lesson).prefetch_related('choices')
+    questions = list(Question.objects.filter(lesson=lesson).prefetch_related('choices'))
+    best = best_attempt(request.user.id, lesson.id) if attempts_used(latest) else None
+    # Restore autosaved answers of the attempt in progress
+    draft = latest if latest is not None and latest.status == 'IN_PROGRESS' else None
+    saved = saved_answers(request.user.id, lesson.id, draft)
     
-    # Check if student already has a submission for this lesson
-    existing_submission = Submission.objects.filter(
-        student=request.user,
-        lesson=lesson
-    ).first()
+    context = exam_context(lesson, questions, latest, best, saved)
+    return render(request, 'online_course/exam_submission.html', context)
+
+
+def exam_context(lesson, questions, latest, best, saved):
+    """
+    Context of exam_submission.html, shared with the async submit view.
+    ``saved`` maps question ids to the learner's autosaved choices.
+    """
+    used = attempts_used(latest)
+    remaining = attempts_left(lesson, used)
+    for question in questions:
+        question.saved_choice_id = saved.get(question.id)
     
-    context = {
+    return {
         'lesson': lesson,
         'questions': questions,
-        'existing_submission': existing_submission,
+        'question_count': len(questions),
+        'total_points': sum(question.points for question in questions),
+        'latest_attempt': latest,
+        'best_attempt': best,
+        'attempts_used': used,
+        'attempt': used + 1,
+        'max_attempts': max_attempts(lesson),
+        'can_submit': remaining != 0 and (latest is None or latest.status != 'SUBMITTED'),
     }
+
+
+@login_required(login_url='login')
+@require_http_methods(["POST"])
+def autosave(request, lesson_id):
+    """
+    Save a delta of in-progress exam answers, posted as JSON
+    ``{"answers": {question_id: choice_id}, "flush": false}``.
+    Buffered in the cache and written on a debounce; see autosave.py.
+    """
+    try:
+        body = json.loads(request.body)
+        delta = body['answers']
+        if not isinstance(delta, dict):
+            raise TypeError('answers must be an object')
+    except (ValueError, KeyError, TypeError):
+        return HttpResponseBadRequest('Expected {"answers": {question_id: choice_id}}')
     
-    return render(request, 'online_course/exam_submission.html', context)
+    # Also validates the lesson without a query while the key is cached
+    answer_key = get_answer_key(lesson_id)
+    if not answer_key:
+        raise Http404('Lesson not found')
+    
+    result = save_answers(request.user.id, lesson_id, clean_answers(delta, answer_key), flush=bool(body.get('flush')))
+    if result is None:
+        return JsonResponse({'error': 'This exam can no longer be changed.'}, status=409)
+    return JsonResponse(result)
 
 
 @login_required(login_url='login')
@@ -108,48 +149,70 @@ def show_exam_result(request, submission_id):
     Display the results of a submitted exam.
     Shows score, correct/incorrect answers, and detailed feedback.
     """
-    submission = get_object_or_404(Submission, id=submission_id)
+    submission = get_object_or_404(
+        Submission.objects.select_related('student', 'lesson__course'),
+        id=submission_id
+    )
     
     # Ensure the user can only view their own results
-    if submission.student != request.user and not request.user.is_staff:
-        return redirect('course_list')
-    
-    # Get answers for this submission with optimized queries
-    answers = SubmissionAnswer.objects.filter(submission=submission).select_related(
-        'question__lesson',
-        'selected_choice'
-    ).prefetch_related('question__choices')
-    
-    # Prepare detailed results
-    detailed_results = []
-    for answer in answers:
-        result = {
-            'question': answer.question,
-            'question_text': answer.question.question_text,
-            'selected_choice': answer.selected_choice,
-            'is_correct': answer.is_correct,
-            'points_earned': answer.points_earned,
-            'total_points': answer.question.points,
-            'all_choices': answer.question.choices.all(),
-        }
-        detailed_results.append(result)
+    if submission.student_id != request.user.id and not request.user.is_staff:
+        return redirect('online_course:course_list')
+    
+    # Grading is still queued for a worker; let the page poll for it
+    if submission.status != 'GRADED':
+        return render(request, 'online_course/exam_pending.html', pending_context(submission))
     
-    # Calculate additional statistics
-    total_points_possible = sum(r['total_points'] for r in detailed_results)
-    total_points_earned = sum(r['points_earned'] for r in detailed_results)
-    passing_score = 60  # 60% is passing score
+    # Rendered from the snapshot stored at grading time, without reading answers
+    snapshot = get_snapshot(submission)
+    return render(request, 'online_course/exam_result.html', result_context(submission, snapshot))
+
+
+def pending_context(submission):
+    """Context of exam_pending.html, shared with the async result view."""
+    return {
+        'submission': submission,
+        'status_url': reverse('online_course:submission_status', args=[submission.id]),
+    }
+
+
+def result_context(submission, snapshot):
+    """Context of exam_result.html, shared with the async result view."""
+    passing_score = PASSING_SCORE
     is_passed = submission.score >= passing_score
     
-    context = {
+    return {
         'submission': submission,
-        'detailed_results': detailed_results,
-        'total_points_possible': total_points_possible,
-        'total_points_earned': total_points_earned,
+        'can_retake': attempts_left(submission.lesson, submission.attempt) != 0,
+        'detailed_results': detailed_results(snapshot),
+        'total_points_possible': snapshot['points_possible'],
+        'total_points_earned': snapshot['points_earned'],
         'is_passed': is_passed,
         'passing_score': passing_score,
     }
+
+
+@login_required(login_url='login')
+@require_http_methods(["GET"])
+def submission_status(request, submission_id):
+    """
+    Lightweight JSON status of a submission, polled while grading is pending.
+    """
+    status = Submission.objects.filter(id=submission_id).values(
+        'student_id', 'status', 'score'
+    ).first()
+    if status is None:
+        raise Http404('Submission not found')
+    
+    if status['student_id'] != request.user.id and not request.user.is_staff:
+        raise Http404('Submission not found')
     
-    return render(request, 'online_course/exam_result.html', context)
+    graded = status['status'] == 'GRADED'
+    return JsonResponse({
+        'status': status['status'],
+        'graded': graded,
+        'score': status['score'] if graded else None,
+        'result_url': reverse('online_course:show_exam_result', args=[submission_id]),
+    })
 
 
 def course_details(request, course_id):
@@ -157,19 +220,89 @@ def course_details(request, course_id):
     Display detailed information about a course including all lessons and their questions.
     """
     course = get_object_or_404(Course, id=course_id)
-    lessons = Lesson.objects.filter(course=course).prefetch_related('questions__choices')
     
+    # The page body is served from the fragment cache between edits
     context = {
         'course': course,
-        'lessons': lessons,
+        'course_body': render_course_details(course),
     }
     
     return render(request, 'online_course/course_details_bootstrap.html', context)
 
 
+@require_http_methods(["GET"])
+def lesson_fragment(request, lesson_id):
+    """
+    The body of one lesson on course_details, fetched when its accordion item
+    is expanded. Revalidates by ETag without rendering or reading the content.
+    """
+    lesson = get_object_or_404(Lesson.objects.only('id', 'updated_at'), id=lesson_id)
+    key = lesson_body_key(lesson)
+    etag = f'"{key}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(render_lesson_body(lesson, key))
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, no_cache=True)
+    return response
+
+
+@staff_member_required
+def cache_stats(request):
+    """Hit/miss counters of the course_details fragment cache."""
+    return JsonResponse(fragment_cache_stats())
+
+
+@require_http_methods(["GET"])
+def metrics(request):
+    """
+    Request metrics in the Prometheus text format.
+    Readable by staff, or with ``Authorization: Bearer <METRICS_TOKEN>``.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    authorized = request.user.is_authenticated and request.user.is_staff
+    if token and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        authorized = True
+    if not authorized:
+        return HttpResponse('Forbidden', status=403, content_type='text/plain')
+    return HttpResponse(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@staff_member_required
+@require_http_methods(["GET"])
+def export_submissions(request):
+    """
+    Stream submissions and their answers as CSV or JSON Lines.
+    Query parameters: format, gzip, course, lesson, since, until
+    """
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in FORMATS:
+        return HttpResponseBadRequest(f'format must be one of: {", ".join(FORMATS)}')
+    
+    try:
+        filters = {
+            'course_id': int(request.GET['course']) if request.GET.get('course') else None,
+            'lesson_id': int(request.GET['lesson']) if request.GET.get('lesson') else None,
+            'since': parse_boundary(request.GET['since']) if request.GET.get('since') else None,
+            'until': parse_boundary(request.GET['until'], end=True) if request.GET.get('until') else None,
+        }
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+    
+    compress = request.GET.get('gzip') in ('1', 'true', 'yes')
+    filename = f'submissions.{fmt}' + ('.gz' if compress else '')
+    content_type = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    if compress:
+        content_type = 'application/gzip'
+    
+    response = StreamingHttpResponse(stream_export(fmt, compress=compress, **filters), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
 def course_list(request):
     """Display list of all available courses"""
-    courses = Course.objects.all().prefetch_related('lessons')
+    courses = Course.objects.with_lesson_counts()
     
     context = {
         'courses': courses,
@@ -1,10 +1,16 @@
 """
 ASGI config for online_course_project project.
+
+Serves the async course and exam views (ASYNC_VIEWS). Each request runs its
+database queries in a thread of its own, so connections are closed at the
+end of the request rather than kept for the next one on the same thread.
 """
 
 import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'online_course_project.settings')
+os.environ.setdefault('ASYNC_VIEWS', '1')
+os.environ.setdefault('DATABASE_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
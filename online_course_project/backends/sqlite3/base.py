@@ -0,0 +1,48 @@
+"""
+SQLite backend with per-connection tuning for concurrent writers.
+
+Adds the two SQLite OPTIONS that Django only gained in 5.1, under the same
+names, so switching back to the stock backend after upgrading is a
+one-line change:
+
+- ``init_command``: SQL run on every new connection, e.g. PRAGMAs
+  enabling WAL.
+- ``transaction_mode``: ``"IMMEDIATE"`` makes ``atomic()`` start with
+  ``BEGIN IMMEDIATE``. The write lock is taken up front, waiting up to
+  the busy timeout, instead of upgrading a read lock halfway through the
+  transaction. An upgrade fails at once with "database is locked" when
+  another connection is writing.
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    init_command = ''
+    transaction_mode = None
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        self.init_command = kwargs.pop('init_command', '')
+        transaction_mode = kwargs.pop('transaction_mode', None)
+        if transaction_mode is not None and transaction_mode.upper() not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(
+                f'transaction_mode must be one of {", ".join(TRANSACTION_MODES)}, not {transaction_mode!r}'
+            )
+        self.transaction_mode = transaction_mode.upper() if transaction_mode else None
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for statement in self.init_command.split(';'):
+            if statement.strip():
+                conn.execute(statement)
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode is None:
+            super()._start_transaction_under_autocommit()
+        else:
+            self.cursor().execute(f'BEGIN {self.transaction_mode}')
@@ -5,6 +5,8 @@ Django settings for online_course_project project.
 from pathlib import Path
 import os
 
+from .databases import databases_from_env
+
 # Build paths inside the project
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -24,15 +26,19 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'rest_framework',
     'online_course',
 ]
 
 MIDDLEWARE = [
+    'online_course.metrics.MetricsMiddleware',
+    'online_course.query_inspector.QueryInspectorMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'online_course.routers.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -58,13 +64,99 @@ TEMPLATES = [
 WSGI_APPLICATION = 'online_course_project.wsgi.application'
 
 # Database
-DATABASES = {
+# DATABASE_URL / DATABASE_REPLICA_URL, see online_course_project/databases.py.
+# Defaults to SQLite in db.sqlite3 with connections kept for 60 seconds.
+DATABASES = databases_from_env(BASE_DIR)
+DATABASE_ROUTERS = ['online_course.routers.PrimaryReplicaRouter']
+
+# Views whose GET requests may read from the replica (fnmatch patterns on URL
+# names), and how long a client reads from the primary after it writes
+REPLICA_READ_VIEWS = [
+    'online_course:course_list',
+    'online_course:course_details',
+    'online_course:lesson_fragment',
+    'online_course:show_exam_result',
+    'online_course:api-course-*',
+    'online_course:api-lesson-*',
+    'admin:*_changelist',
+]
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', '10'))
+
+# Cache
+# Local-memory by default; point CACHE_BACKEND/CACHE_LOCATION at Redis or
+# Memcached to share cached answer keys between processes.
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'online-course'),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
     }
 }
 
+# Per-lesson answer keys and exam sheets used for grading. Edits invalidate
+# them, but with a per-process cache only in the process that made the edit,
+# so entries also expire after this many seconds (None = never)
+ANSWER_KEY_CACHE_ALIAS = 'default'
+ANSWER_KEY_CACHE_TIMEOUT = int(os.environ.get('ANSWER_KEY_CACHE_TIMEOUT', '300'))
+
+# Server processes sharing the caches above (gunicorn and uvicorn read the
+# same variable); more than one needs a shared cache, see online_course/checks.py
+WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', '1'))
+
+# Rendered course_details page and per-lesson fragments
+FRAGMENT_CACHE_ALIAS = 'default'
+FRAGMENT_CACHE_TIMEOUT = 60 * 60 * 24
+# Render only lesson headers on course_details; bodies load when expanded
+COURSE_DETAILS_LAZY_LESSONS = os.environ.get('COURSE_DETAILS_LAZY_LESSONS', '').lower() in ('1', 'true', 'yes')
+
+# Serve the course and exam pages from online_course/async_views.py; asgi.py
+# turns this on, WSGI deployments keep the sync views
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', '').lower() in ('1', 'true', 'yes')
+
+# Grading
+# When enabled, exam POSTs only store the raw answers and return immediately;
+# run `python manage.py grade_worker` to grade queued submissions.
+ASYNC_GRADING = os.environ.get('ASYNC_GRADING', '').lower() in ('1', 'true', 'yes')
+
+# Exam attempts per learner and lesson, unless Lesson.max_attempts is set
+# (None = unlimited); see online_course/attempts.py
+EXAM_MAX_ATTEMPTS = 3
+
+# Largest body, after gzip decompression, accepted by the ingest API
+# (/api/submissions/ingest/). The body is read as a stream, a line at a time,
+# so DATA_UPLOAD_MAX_MEMORY_SIZE does not apply to it
+INGEST_MAX_UPLOAD_SIZE = int(os.environ.get('INGEST_MAX_UPLOAD_SIZE', str(100 * 1024 * 1024)))
+
+# Autosaved exam answers are buffered in this cache (shared between
+# processes in production) and written to the draft attempt at most once per
+# AUTOSAVE_FLUSH_INTERVAL seconds; see online_course/autosave.py
+AUTOSAVE_CACHE_ALIAS = 'default'
+AUTOSAVE_FLUSH_INTERVAL = 30
+AUTOSAVE_BUFFER_TIMEOUT = 60 * 60 * 24
+
+# Request metrics (see online_course/metrics.py), scraped from /metrics.
+# Set METRICS_SAMPLE_RATE below 1 to measure only a fraction of requests.
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '').lower() in ('1', 'true', 'yes')
+METRICS_SAMPLE_RATE = float(os.environ.get('METRICS_SAMPLE_RATE', '1.0'))
+METRICS_SERVER_TIMING = True
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Slow/duplicate query detection for development and staging (see
+# online_course/query_inspector.py); summarize the log with `query_report`
+QUERY_INSPECTOR_ENABLED = os.environ.get('QUERY_INSPECTOR_ENABLED', '').lower() in ('1', 'true', 'yes')
+QUERY_INSPECTOR_SLOW_MS = float(os.environ.get('QUERY_INSPECTOR_SLOW_MS', '100'))
+QUERY_INSPECTOR_DUPLICATE_THRESHOLD = 2
+QUERY_INSPECTOR_LOG = os.environ.get('QUERY_INSPECTOR_LOG', '')
+
+# JSON API (/api/); responses are JSON only and paginated with cursors
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': ['rest_framework.renderers.JSONRenderer'],
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'rest_framework.authentication.SessionAuthentication',
+        'rest_framework.authentication.BasicAuthentication',
+    ],
+}
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},